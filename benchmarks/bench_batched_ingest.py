@@ -0,0 +1,152 @@
+"""Compare the per-row token ingest path with BatchInsert
+
+This writes synthetic tokens into the configured database and
+removes them again afterwards. All benchmark tokens are prefixed
+so they never collide with real data.
+
+Run from the repository root:
+$ python -m benchmarks.bench_batched_ingest --tokens 20000
+"""
+import argparse
+import random
+import string
+from time import perf_counter
+from types import SimpleNamespace
+
+from models.crud.batch_insert import BatchInsert
+from models.crud.database_handler import Mariadb
+from models.crud.insert import Insert
+from models.crud.read import Read
+from models.token import Token
+
+PREFIX = "benchmarktoken"
+WORDS = [
+    "regeringen",
+    "riksdagen",
+    "föreslår",
+    "att",
+    "utskottet",
+    "propositionen",
+    "kommunerna",
+    "betänkande",
+    "lagen",
+    "myndigheten",
+]
+
+
+def setup_sentence(document: SimpleNamespace) -> SimpleNamespace:
+    read = Read()
+    read.connect_and_setup()
+    sentence = SimpleNamespace(detected_language="sv", score=1.0, document=document)
+    if not read.get_score(sentence=sentence):
+        insert = Insert()
+        insert.connect_and_setup()
+        insert.insert_score(sentence=sentence)
+        insert.close_db()
+    sentence.language_id = read.get_language(sentence=sentence)
+    sentence.score_id = read.get_score(sentence=sentence)
+    read.close_db()
+    return sentence
+
+
+def letters(number: int) -> str:
+    """a, b, ..., z, ba, bb, ... so the forms have no digits,
+    Token.is_accepted_token rejects tokens with digits"""
+    suffix = string.ascii_lowercase[number % 26]
+    while number >= 26:
+        number //= 26
+        suffix = string.ascii_lowercase[number % 26] + suffix
+    return suffix
+
+
+def generate_tokens(number_of_tokens: int, vocabulary_size: int, sentence):
+    """Zipf-like sample so a few forms dominate like in real text"""
+    rng = random.Random(42)
+    forms = [
+        f"{PREFIX}{letters(rank)}{WORDS[rank % len(WORDS)]}"
+        for rank in range(vocabulary_size)
+    ]
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    for text in rng.choices(forms, weights=weights, k=number_of_tokens):
+        yield Token(token=SimpleNamespace(text=text, pos_="NOUN"), sentence=sentence)
+
+
+def ingest(tokens, document: SimpleNamespace) -> float:
+    start = perf_counter()
+    for token in tokens:
+        token.analyze_and_insert()
+    if document.batch is not None:
+        document.batch.close_db()
+    return perf_counter() - start
+
+
+def count_written_rawtokens() -> int:
+    read = Read()
+    read.connect_and_setup()
+    read.cursor.execute(
+        """SELECT COUNT(DISTINCT rawtoken.id) FROM rawtoken
+        JOIN rawtoken_normtoken_linking
+        ON rawtoken_normtoken_linking.rawtoken = rawtoken.id
+        WHERE rawtoken.text LIKE %s""",
+        (f"{PREFIX}%",),
+    )
+    count = read.cursor.fetchone()[0]
+    read.close_db()
+    return count
+
+
+def cleanup():
+    database = Mariadb()
+    database.connect_and_setup()
+    pattern = f"{PREFIX}%"
+    database.cursor.execute(
+        """DELETE rawtoken_normtoken_linking FROM rawtoken_normtoken_linking
+        JOIN rawtoken ON rawtoken.id = rawtoken_normtoken_linking.rawtoken
+        WHERE rawtoken.text LIKE %s""",
+        (pattern,),
+    )
+    database.cursor.execute("DELETE FROM rawtoken WHERE text LIKE %s", (pattern,))
+    database.cursor.execute("DELETE FROM normtoken WHERE text LIKE %s", (pattern,))
+    database.commit_to_database()
+    database.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--vocabulary-size", type=int, default=2000)
+    parser.add_argument("--flush-size", type=int, default=10000)
+    arguments = parser.parse_args()
+
+    results = dict()
+    for mode in ("per_row", "batched"):
+        cleanup()
+        document = SimpleNamespace(batch=None, sink=None)
+        if mode == "batched":
+            document.batch = BatchInsert(flush_size=arguments.flush_size)
+        sentence = setup_sentence(document=document)
+        tokens = list(
+            generate_tokens(
+                number_of_tokens=arguments.tokens,
+                vocabulary_size=arguments.vocabulary_size,
+                sentence=sentence,
+            )
+        )
+        results[mode] = ingest(tokens=tokens, document=document)
+        # A benchmark that writes nothing would measure nothing
+        expected = len({token.rawtoken for token in tokens})
+        written = count_written_rawtokens()
+        if written != expected:
+            raise SystemExit(
+                f"{mode}: wrote {written} of {expected} rawtokens with links"
+            )
+        print(
+            f"{mode}: {arguments.tokens} tokens in {results[mode]:.2f}s "
+            f"({arguments.tokens / results[mode]:.0f} tokens/s)"
+        )
+    cleanup()
+    print(f"speedup: {results['per_row'] / results['batched']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
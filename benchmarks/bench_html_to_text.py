@@ -0,0 +1,107 @@
+"""Compare the HTML to text converters on the largest documents
+
+The BeautifulSoup converter builds the whole object graph before
+get_text, the lxml converter streams the text out of a pull parser
+and clears the tree as it goes. Every converter runs in a fresh
+process so the peak RSS it adds over the loaded HTML is its own.
+
+Run from the repository root:
+$ python -m benchmarks.bench_html_to_text data/se/riksdagen/proposition --documents 20
+"""
+import argparse
+import os
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+from models.document_source import DocumentSource
+from models.html_text import beautifulsoup_html_to_text, iterate_html_text
+
+CONVERTERS = {
+    "beautifulsoup": beautifulsoup_html_to_text,
+    "lxml": lambda html: " ".join(iterate_html_text(html=html)),
+}
+
+
+def largest_html_files(directory: str, number_of_documents: int) -> List[str]:
+    source = DocumentSource(workdirectory=directory)
+    file_paths = sorted(source.iterate_file_paths(), key=os.path.getsize, reverse=True)
+    largest = list()
+    for file_path in file_paths:
+        fields = source.read_fields(file_path=file_path)
+        if fields and fields.get("html"):
+            largest.append(file_path)
+            if len(largest) == number_of_documents:
+                break
+    return largest
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB and macOS bytes
+    return peak / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+def run_converter(
+    name: str, file_paths: List[str], repeat: int
+) -> Tuple[float, float, int, int]:
+    """Return (best seconds, added peak RSS in MB, MB of html, words)"""
+    source = DocumentSource(workdirectory=os.path.dirname(file_paths[0]))
+    htmls = [source.read_fields(file_path=path)["html"] for path in file_paths]
+    convert = CONVERTERS[name]
+    baseline = peak_rss_mb()
+    best = float("inf")
+    words = 0
+    for _ in range(repeat):
+        start = perf_counter()
+        words = sum(len(convert(html).split()) for html in htmls)
+        best = min(best, perf_counter() - start)
+    size = sum(len(html.encode("utf-8")) for html in htmls)
+    return best, peak_rss_mb() - baseline, size, words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=os.path.join("data", "se", "riksdagen"),
+    )
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+
+    file_paths = largest_html_files(
+        directory=arguments.directory, number_of_documents=arguments.documents
+    )
+    if not file_paths:
+        raise SystemExit(f"no documents with html found in {arguments.directory}")
+    results: Dict[str, Tuple[float, float, int, int]] = dict()
+    for name in CONVERTERS:
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=get_context("spawn")
+        ) as executor:
+            results[name] = executor.submit(
+                run_converter,
+                name=name,
+                file_paths=file_paths,
+                repeat=arguments.repeat,
+            ).result()
+        seconds, added_rss, size, words = results[name]
+        print(
+            f"{name}: {len(file_paths)} documents, {size / 1024**2:.1f} MB html "
+            f"in {seconds:.3f}s ({size / 1024**2 / seconds:.1f} MB/s), "
+            f"peak RSS +{added_rss:.1f} MB, {words} words"
+        )
+    print(
+        f"speedup: {results['beautifulsoup'][0] / results['lxml'][0]:.1f}x, "
+        f"words left out with the tables: "
+        f"{results['beautifulsoup'][3] - results['lxml'][3]}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""End-to-end ingest benchmark over downloaded Riksdagen documents
+
+Every subdirectory of the corpus is a dataset from config/datasets.yml
+with the dokumentstatus JSON files downloaded from Riksdagen, by default
+data/se/riksdagen. Use --max-documents to benchmark a fixed sample of a
+larger download. The corpus is fingerprinted by the paths and sizes of
+its files, only results with the same fingerprint are comparable. The
+Analyzer extracts them into a fresh
+SQLite database in a temporary directory, with a fresh language cache,
+so runs on different machines and commits do the same work. The spaCy
+and fasttext models are loaded before the clock starts.
+
+We report documents/s, sentences/s, tokens/s, database statements per
+token and the peak RSS of the process. Tokens are the accepted tokens
+linked to a sentence. The results are written as JSON to
+benchmarks/results so regressions can be tracked over time.
+
+Run from the repository root:
+$ python -m benchmarks.bench_ingest --max-documents 200
+$ python -m benchmarks.bench_ingest --corpus /data/riksdagen --repeat 3
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+import config
+from models.analyzer import Analyzer
+from models.crud.database_handler import use_backend
+from models.crud.lookup_tables import lookup_tables
+from models.crud.lru_cache import normtoken_ids, rawtoken_ids
+from models.crud.sqlite import SqliteBackend, SqliteCursor
+from models.language_cache import language_cache
+from models.language_detector import language_detector
+from models.pipelines import Pipelines
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join("data", "se", "riksdagen")
+RESULTS = os.path.join(BENCHMARKS_DIRECTORY, "results")
+COUNTS = {
+    "documents": "SELECT COUNT(*) FROM document WHERE processed",
+    "sentences": "SELECT COUNT(*) FROM sentence",
+    "tokens": "SELECT COUNT(*) FROM rawtoken_sentence_linking",
+    "rawtokens": "SELECT COUNT(*) FROM rawtoken",
+    "normtokens": "SELECT COUNT(*) FROM normtoken",
+    "entities": "SELECT COUNT(*) FROM entity",
+}
+
+
+class CountingCursor(SqliteCursor):
+    """Counts the statements sent by the CRUD classes, an
+    executemany counts once like the multi-row insert of pymysql"""
+
+    __slots__ = ("backend",)
+
+    def __init__(self, cursor: sqlite3.Cursor, backend: "CountingSqliteBackend"):
+        super().__init__(cursor=cursor)
+        self.backend = backend
+
+    def execute(self, query: str, params: Any = None) -> None:
+        self.backend.queries += 1
+        super().execute(query, params)
+
+    def executemany(self, query: str, params: Any) -> None:
+        self.backend.queries += 1
+        super().executemany(query, params)
+
+
+class CountingSqliteBackend(SqliteBackend):
+    queries: int = 0
+
+    def acquire(self) -> Tuple[sqlite3.Connection, CountingCursor]:
+        connection, cursor = super().acquire()
+        return connection, CountingCursor(cursor=cursor.cursor, backend=self)
+
+
+def write_datasets_config(corpus: str, path: str) -> None:
+    """Point the datasets of config/datasets.yml at the corpus subdirectories"""
+    with open("config/datasets.yml") as file:
+        known_datasets = yaml.safe_load(file)
+    datasets = dict()
+    for name in sorted(os.listdir(corpus)):
+        directory = os.path.join(corpus, name)
+        if not os.path.isdir(directory):
+            continue
+        if name not in known_datasets:
+            print(f"Skipping {directory} which is not a dataset in config/datasets.yml")
+            continue
+        datasets[name] = dict(
+            known_datasets[name], workdirectory=os.path.abspath(directory)
+        )
+    if not datasets:
+        raise ValueError(f"no dataset directories found in {corpus}")
+    with open(path, "w") as file:
+        yaml.safe_dump(datasets, file)
+
+
+def fingerprint_corpus(corpus: str) -> Dict[str, Any]:
+    """Number, size and a hash of the relative paths and sizes of the JSON files"""
+    digest = hashlib.sha256()
+    files = 0
+    size = 0
+    for directory, directories, names in os.walk(corpus):
+        directories.sort()
+        for name in sorted(names):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(directory, name)
+            file_size = os.path.getsize(path)
+            digest.update(f"{os.path.relpath(path, corpus)}\t{file_size}\n".encode())
+            files += 1
+            size += file_size
+    return dict(
+        files=files, megabytes=round(size / 1024**2, 1), sha256=digest.hexdigest()
+    )
+
+
+def reset_caches(language_cache_path: str):
+    """The caches hold ids from the previous database or results
+    from the previous run, every run starts cold"""
+    for cache in (rawtoken_ids, normtoken_ids):
+        cache.clear()
+    lookup_tables.clear()
+    language_cache.close()
+    language_cache.path = language_cache_path
+    language_cache.memory.clear()
+    language_cache.hits = 0
+    language_cache.misses = 0
+
+
+def count_rows(path: str) -> Dict[str, int]:
+    connection = sqlite3.connect(path)
+    counts = {
+        name: connection.execute(query).fetchone()[0] for name, query in COUNTS.items()
+    }
+    connection.close()
+    return counts
+
+
+def run_once(
+    corpus: str, pipelines: Pipelines, max_documents: int, verbose: bool
+) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        datasets_config_path = os.path.join(directory, "datasets.yml")
+        write_datasets_config(corpus=corpus, path=datasets_config_path)
+        reset_caches(
+            language_cache_path=os.path.join(directory, "language_cache.sqlite")
+        )
+        database_path = os.path.join(directory, "riksdagen.sqlite")
+        backend = CountingSqliteBackend(path=database_path)
+        previous_backend = use_backend(backend)
+        analyzer = Analyzer(
+            datasets_config_path=datasets_config_path,
+            max_documents_to_extract=max_documents,
+            pipelines=pipelines,
+        )
+        # The analyzer prints progress for every document and sentence
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+            sys.stdout if verbose else devnull
+        ):
+            start = perf_counter()
+            analyzer.start()
+            seconds = perf_counter() - start
+        use_backend(previous_backend)
+        counts = count_rows(path=database_path)
+    result = dict(seconds=round(seconds, 3), queries=backend.queries, **counts)
+    for name in ("documents", "sentences", "tokens"):
+        result[f"{name}_per_second"] = round(counts[name] / seconds, 1)
+    result["queries_per_token"] = (
+        round(backend.queries / counts["tokens"], 3) if counts["tokens"] else None
+    )
+    return result
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB and macOS bytes
+    return round(peak / (1024**2 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--corpus",
+        default=CORPUS,
+        help="directory with a subdirectory of dokumentstatus JSON files per dataset",
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-documents", type=int, default=0)
+    parser.add_argument(
+        "--output", help=f"JSON file to write, by default a new file in {RESULTS}"
+    )
+    parser.add_argument("--verbose", action="store_true")
+    arguments = parser.parse_args()
+    if not os.path.isdir(arguments.corpus):
+        raise SystemExit(
+            f"{arguments.corpus} not found, download the datasets "
+            "from Riksdagen first, see the README"
+        )
+    corpus = fingerprint_corpus(corpus=arguments.corpus)
+    print(
+        f"corpus: {corpus['files']} files, {corpus['megabytes']} MB, "
+        f"sha256 {corpus['sha256'][:12]}"
+    )
+
+    start = perf_counter()
+    pipelines = Pipelines()
+    pipelines.get()
+    language_detector.load_model()
+    model_load_seconds = perf_counter() - start
+
+    runs = list()
+    for number in range(1, arguments.repeat + 1):
+        result = run_once(
+            corpus=arguments.corpus,
+            pipelines=pipelines,
+            max_documents=arguments.max_documents,
+            verbose=arguments.verbose,
+        )
+        runs.append(result)
+        print(
+            f"run {number}: {result['documents']} documents, "
+            f"{result['sentences']} sentences and {result['tokens']} tokens "
+            f"in {result['seconds']:.2f}s "
+            f"({result['documents_per_second']:.1f} documents/s, "
+            f"{result['sentences_per_second']:.0f} sentences/s, "
+            f"{result['tokens_per_second']:.0f} tokens/s, "
+            f"{result['queries_per_token']} queries/token)"
+        )
+    commit = git_commit()
+    report = dict(
+        benchmark="ingest",
+        date=datetime.now().isoformat(timespec="seconds"),
+        commit=commit,
+        python=platform.python_version(),
+        machine=platform.machine(),
+        corpus=dict(path=os.path.relpath(arguments.corpus), **corpus),
+        max_documents=arguments.max_documents,
+        config=dict(
+            spacy_model=config.spacy_model,
+            fasttext_model=config.fasttext_model,
+            batched_ingest=config.batched_ingest,
+            ingest_flush_size=config.ingest_flush_size,
+            spacy_batch_size=config.spacy_batch_size,
+        ),
+        model_load_seconds=round(model_load_seconds, 3),
+        peak_rss_mb=peak_rss_mb(),
+        best=min(runs, key=lambda run: run["seconds"]),
+        runs=runs,
+    )
+    output = arguments.output or os.path.join(
+        RESULTS,
+        f"ingest_{datetime.now():%Y%m%d_%H%M%S}_{commit or 'unknown'}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+        file.write("\n")
+    print(f"peak RSS: {report['peak_rss_mb']} MB, wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
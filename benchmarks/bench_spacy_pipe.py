@@ -0,0 +1,95 @@
+"""Measure spaCy throughput per chunk versus batched nlp.pipe
+
+Reads a fixed, sorted sample of Riksdagen dokumentstatus JSON files,
+converts and chunks them like Document does and reports tokens/second
+for calling nlp(chunk) one chunk at a time and for nlp.pipe.
+No database is needed.
+
+Run from the repository root:
+$ python -m benchmarks.bench_spacy_pipe data/se/riksdagen/proposition --documents 50
+"""
+import argparse
+import json
+import os
+from time import perf_counter
+from typing import List
+
+import config
+from models.document import Document
+from models.pipelines import Pipelines
+
+
+def load_chunks(directory: str, number_of_documents: int) -> List[str]:
+    file_paths = sorted(
+        os.path.join(root, file)
+        for root, _, files in os.walk(directory)
+        for file in files
+        if file.endswith(".json")
+    )[:number_of_documents]
+    chunks = list()
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8-sig") as json_file:
+            dokument = json.load(json_file)["dokumentstatus"]["dokument"]
+        document = Document(
+            external_id=dokument["dok_id"],
+            dataset_id=0,
+            text=dokument.get("text") or "",
+            html=dokument.get("html") or "",
+        )
+        if not document.text:
+            document.convert_html_to_text()
+        document.chunk_text()
+        chunks.extend(document.cleaned_chunks())
+    return chunks
+
+
+def one_chunk_at_a_time(nlp, chunks: List[str]) -> int:
+    return sum(len(nlp(chunk)) for chunk in chunks)
+
+
+def batched(nlp, chunks: List[str], batch_size: int, n_process: int) -> int:
+    return sum(
+        len(doc) for doc in nlp.pipe(chunks, batch_size=batch_size, n_process=n_process)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="Directory with dokumentstatus JSON files")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--model", default=config.spacy_model)
+    parser.add_argument("--batch-size", type=int, default=config.spacy_batch_size)
+    parser.add_argument("--n-process", type=int, default=config.spacy_n_process)
+    arguments = parser.parse_args()
+
+    chunks = load_chunks(
+        directory=arguments.directory, number_of_documents=arguments.documents
+    )
+    nlp = Pipelines().get(model=arguments.model)
+    print(f"{len(chunks)} chunks from {arguments.documents} documents")
+
+    start = perf_counter()
+    tokens = one_chunk_at_a_time(nlp=nlp, chunks=chunks)
+    before = perf_counter() - start
+    print(
+        f"nlp(chunk): {tokens} tokens in {before:.2f}s ({tokens / before:.0f} tokens/s)"
+    )
+
+    start = perf_counter()
+    tokens = batched(
+        nlp=nlp,
+        chunks=chunks,
+        batch_size=arguments.batch_size,
+        n_process=arguments.n_process,
+    )
+    after = perf_counter() - start
+    print(
+        f"nlp.pipe(batch_size={arguments.batch_size}, "
+        f"n_process={arguments.n_process}): "
+        f"{tokens} tokens in {after:.2f}s ({tokens / after:.0f} tokens/s)"
+    )
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
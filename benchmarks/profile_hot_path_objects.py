@@ -0,0 +1,106 @@
+"""Time and allocations of the objects built per sentence and token
+
+Builds a Sentence for every sentence and a Token for every token of
+some text, once with pydantic models shaped like the ones we used
+before and once with the __slots__ classes in models/, and reports
+the time and the memory allocated according to tracemalloc.
+No database or spaCy model is needed.
+
+Run from the repository root:
+$ python -m benchmarks.profile_hot_path_objects --sentences 20000
+"""
+import argparse
+import tracemalloc
+from time import perf_counter
+from typing import Any, Callable, List
+
+import spacy
+from pydantic import BaseModel
+from spacy.language import Doc
+from spacy.tokens import Span
+
+from models.sentence import Sentence
+from models.token import Token
+
+TEXT = (
+    "Regeringen föreslår att riksdagen antar regeringens förslag till lag "
+    "om ändring i lagen om kommunal redovisning. "
+    "Utskottet har inte funnit skäl att föreslå någon ändring. "
+)
+
+
+class PydanticSentence(BaseModel):
+    sent: Span
+    doc: Doc
+    document: Any
+    accepted_tokens: List[Any] = list()
+    uuid: str = ""
+    score: float = 0.0
+    detected_language: str = ""
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class PydanticToken(BaseModel):
+    token: Any
+    sentence: Any
+
+
+def build(doc: Doc, sentence_class: Callable, token_class: Callable) -> int:
+    """Document keeps its sentences and they keep their tokens, so do we"""
+    count = 0
+    sentences = list()
+    for sent in doc.sents:
+        sentence = sentence_class(sent=sent, doc=doc, document=None)
+        sentences.append(sentence)
+        for token_ in sent:
+            sentence.accepted_tokens.append(
+                token_class(token=token_, sentence=sentence)
+            )
+            count += 1
+    return count
+
+
+def measure(name: str, doc: Doc, sentence_class: Callable, token_class: Callable):
+    start = perf_counter()
+    objects = build(doc=doc, sentence_class=sentence_class, token_class=token_class)
+    seconds = perf_counter() - start
+    tracemalloc.start()
+    build(doc=doc, sentence_class=sentence_class, token_class=token_class)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name}: {objects} tokens in {seconds:.3f}s "
+        f"({objects / seconds:.0f} tokens/s), peak {peak / 1024 / 1024:.1f} MiB"
+    )
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=20000)
+    arguments = parser.parse_args()
+
+    nlp = spacy.blank("sv")
+    nlp.add_pipe("sentencizer")
+    nlp.max_length = 10**8
+    doc = nlp(TEXT * (arguments.sentences // 2))
+
+    before_seconds, before_peak = measure(
+        name="pydantic",
+        doc=doc,
+        sentence_class=PydanticSentence,
+        token_class=PydanticToken,
+    )
+    after_seconds, after_peak = measure(
+        name="__slots__", doc=doc, sentence_class=Sentence, token_class=Token
+    )
+    print(
+        f"time {before_seconds / after_seconds:.1f}x faster, "
+        f"peak memory {before_peak / after_peak:.1f}x smaller"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,3 +6,52 @@ accepted_languages = {"sv", "en", "nb", "de", "fr"}
 fasttext_model = "lid.176.bin"
 fasttext_model_download_date = datetime.strptime("2023-12-21", "%Y-%m-%d").date()
 loglevel = logging.INFO
+# The Swedish model is loaded once per process, see models/pipelines.py
+spacy_model = "sv_core_news_lg"
+# "mariadb" or "sqlite", see models/crud/database_handler.py
+database_backend = "mariadb"
+# SQLite database file used when database_backend is "sqlite"
+sqlite_path = "riksdagen.sqlite"
+# MariaDB connection
+mariadb_host = "localhost"
+mariadb_user = "riksdagen"
+mariadb_password = "password"
+mariadb_database = "riksdagen"
+# Number of idle connections kept open for reuse per process
+mariadb_pool_size = 4
+# Idle connections older than this are pinged before they are handed out
+mariadb_pool_health_check_seconds = 30
+# Accumulate rawtokens, normtokens and links per document and write them
+# with multi-row statements, see models/crud/batch_insert.py
+batched_ingest = True
+# Number of pending rows that triggers a flush and commit
+ingest_flush_size = 10000
+# Max entries in the LRU caches in front of rawtoken and normtoken id lookups
+rawtoken_id_cache_size = 200000
+normtoken_id_cache_size = 200000
+# Number of chunks spaCy processes together in nlp.pipe
+spacy_batch_size = 32
+# Processes used by nlp.pipe within one worker, see also --workers
+spacy_n_process = 1
+# Max number of lexemes whose acceptance we remember, see models/token_filter.py
+token_filter_cache_size = 500000
+# SQLite file with language detection results per cleaned sentence hash,
+# kept between runs. Set to "" to disable the cache.
+language_cache_path = "language_cache.sqlite"
+# Max rows kept in the file and max entries kept in memory
+language_cache_size = 2000000
+language_cache_memory_size = 100000
+# Where --offline writes TSV files per dataset shard for OfflineLoader
+offline_directory = "offline"
+# Time the stages of the pipeline and the CRUD methods, see models/instrumentation.py
+instrumentation = True
+# Number of slowest documents whose timings are kept
+instrumentation_slowest_documents = 10
+# Statements slower than this are logged with their normalized SQL,
+# see models/crud/timed_cursor.py. Zero disables the log.
+slow_query_seconds = 1.0
+# Seconds between the stack samples of --profile, see models/profiler.py
+profile_sample_interval = 0.005
+# "lxml" streams the text out of the html of a document and leaves out
+# tables, "beautifulsoup" is the old converter, see models/html_text.py
+html_converter = "lxml"
@@ -5,10 +5,18 @@ from typing import List
 from pandas import DataFrame
 from pydantic import BaseModel
 
+import config
 from models.crud.create import Create
-from models.crud.database_handler import Mariadb
+from models.crud.database_handler import Mariadb, get_backend
+from models.crud.lru_cache import normtoken_ids, rawtoken_ids
+from models.crud.offline_loader import OfflineLoader
 from models.datasets import Datasets
 from models.document import Document
+from models.instrumentation import instrumentation
+from models.language_cache import language_cache
+from models.language_detector import language_detector
+from models.profiler import profiler
+from models.pipelines import Pipelines
 
 logger = logging.getLogger(__name__)
 
@@ -21,11 +29,16 @@ class Analyzer(BaseModel):
     df: DataFrame = DataFrame()
     max_documents_to_extract: int = 0  # zero means no limit
     max_datasets_to_extract: int = 0  # zero means no limit
+    workers: int = 1  # number of worker processes per dataset
+    offline: bool = False  # write TSV files instead of to MariaDB
+    datasets_config_path: str = "config/datasets.yml"
+    metrics_path: str = ""  # where to write the timings, see --metrics
     skipped_documents_count: int = 0
     parser: argparse.ArgumentParser = argparse.ArgumentParser()
     arguments: argparse.Namespace = argparse.Namespace()
     mariadb: Mariadb = Mariadb()
     datasets: Datasets = None
+    pipelines: Pipelines = Pipelines()
 
     class Config:
         arbitrary_types_allowed = True
@@ -33,7 +46,26 @@ class Analyzer(BaseModel):
     def start(self):
         self.setup_database()
         self.setup_datasets()
-        self.datasets.iterate_datasets()
+        if profiler.enabled:
+            # Keep loading the models out of the profile
+            self.pipelines.get()
+            language_detector.load_model()
+            profiler.start()
+        try:
+            self.datasets.iterate_datasets()
+        finally:
+            # Also write the profile when a run crashes or is interrupted
+            profiler.stop()
+        self.pipelines.print_load_report()
+        rawtoken_ids.print_statistics()
+        normtoken_ids.print_statistics()
+        language_detector.print_statistics()
+        language_cache.print_statistics()
+        language_cache.close()
+        instrumentation.print_statistics()
+        if self.metrics_path:
+            instrumentation.dump(path=self.metrics_path)
+        get_backend().close_all()
 
     @staticmethod
     def setup_database():
@@ -46,6 +78,9 @@ class Analyzer(BaseModel):
             analyzer=self,
             max_documents_to_extract=self.max_documents_to_extract,
             max_datasets_to_extract=self.max_datasets_to_extract,
+            workers=self.workers,
+            offline=self.offline,
+            datasets_config_path=self.datasets_config_path,
         )
         self.datasets.setup()
 
@@ -56,7 +91,32 @@ class Analyzer(BaseModel):
             self.max_documents_to_extract = self.arguments.max_documents
         if self.arguments.max_datasets:
             self.max_datasets_to_extract = self.arguments.max_datasets
-        self.start()
+        if self.arguments.workers:
+            self.workers = self.arguments.workers
+        if self.arguments.offline:
+            self.offline = True
+        if self.arguments.metrics:
+            self.metrics_path = self.arguments.metrics
+        if self.arguments.profile_sample and not self.arguments.profile:
+            self.parser.error("--profile-sample needs --profile")
+        if self.arguments.profile:
+            if self.workers > 1:
+                print("Only the main process is profiled, use --workers 1")
+            profiler.path = self.arguments.profile
+            profiler.max_documents = self.arguments.profile_sample or 0
+        if self.arguments.load_offline:
+            self.load_offline()
+        else:
+            self.start()
+
+    def load_offline(self):
+        """Bulk import the files written by an earlier --offline run"""
+        self.setup_database()
+        loader = OfflineLoader()
+        loader.connect_and_setup()
+        loader.load_all(directory=config.offline_directory)
+        loader.close_db()
+        get_backend().close_all()
 
     def print_number_of_skipped_documents(self):
         print(
@@ -71,7 +131,7 @@ class Analyzer(BaseModel):
         self.parser.add_argument(
             "--max-documents",
             type=int,
-            help="Max number of documents to process per dataset",
+            help="Max number of documents to process per dataset " "and worker process",
             required=False,
         )
         self.parser.add_argument(
@@ -80,3 +140,41 @@ class Analyzer(BaseModel):
             help="Max number of datasets to process",
             required=False,
         )
+        self.parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of processes that extract documents in parallel, "
+            "each holding its own spaCy model and database connections",
+            required=False,
+        )
+        self.parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="Write sentences, tokens and entities to TSV files "
+            f"in '{config.offline_directory}' instead of to the database",
+        )
+        self.parser.add_argument(
+            "--load-offline",
+            action="store_true",
+            help="Load the files written by --offline into the database "
+            "with LOAD DATA and exit",
+        )
+        self.parser.add_argument(
+            "--metrics",
+            help="Write the time spent per stage and CRUD method to this file "
+            "as JSON, or in the Prometheus text format if it ends in .prom",
+            required=False,
+        )
+        self.parser.add_argument(
+            "--profile",
+            help="Write cProfile stats to this file and sampled stacks "
+            "in the collapsed flame graph format next to it",
+            required=False,
+        )
+        self.parser.add_argument(
+            "--profile-sample",
+            type=int,
+            help="Stop profiling after this number of documents, "
+            "by default the whole run is profiled",
+            required=False,
+        )
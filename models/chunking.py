@@ -0,0 +1,56 @@
+from typing import Iterator, List
+
+# Where we prefer to end a chunk, best first. The separator stays at the
+# end of the chunk so joining the chunks gives back the text.
+BOUNDARIES = (
+    ("\n\n",),
+    ("\n",),
+    (". ", "? ", "! "),
+    (" ",),
+)
+
+
+def find_chunk_end(text: str, start: int, chunk_size: int) -> int:
+    """End of the chunk that starts at start in a text longer than that
+
+    We look for the best boundary in the second half of the window
+    first so chunks do not get small, then in the whole window. Without
+    any boundary we split the text at chunk_size."""
+    limit = start + chunk_size
+    for low in (start + chunk_size // 2, start):
+        for separators in BOUNDARIES:
+            end = 0
+            for separator in separators:
+                position = text.rfind(separator, low, limit)
+                if position != -1:
+                    end = max(end, position + len(separator))
+            if end:
+                return end
+    return limit
+
+
+def iterate_chunk_ends(text: str, chunk_size: int, start: int = 0) -> Iterator[int]:
+    """Yield the end offset of every chunk of the text from start on,
+    the last one is len(text)
+
+    Every window is searched from its end with str.rfind so the whole
+    text is scanned a constant number of times."""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    if not 0 <= start <= len(text):
+        raise ValueError(f"start {start} is outside the text")
+    while len(text) - start > chunk_size:
+        start = find_chunk_end(text=text, start=start, chunk_size=chunk_size)
+        yield start
+    if start < len(text):
+        yield len(text)
+
+
+def iterate_chunks(text: str, chunk_ends: List[int], first: int = 0) -> Iterator[str]:
+    """Slice the chunks from the first one on when they are needed"""
+    if not 0 <= first <= len(chunk_ends):
+        raise ValueError(f"there is no chunk {first} of {len(chunk_ends)}")
+    start = chunk_ends[first - 1] if first else 0
+    for end in chunk_ends[first:]:
+        yield text[start:end]
+        start = end
@@ -0,0 +1,22 @@
+"""Text cleaning shared by the sentence and token models
+
+The translation table is built once at import so cleaning
+a sentence is a single str.translate pass plus a split."""
+import string
+
+SENTENCE_TRANSLATION = str.maketrans(
+    {"\t": " ", **{char: None for char in ":()-–/" + string.punctuation}}
+)
+
+
+def clean_sentence(text: str) -> str:
+    """Remove tabs, punctuation and words containing digits
+
+    Equivalent to replacing each character one at a time,
+    dropping string.punctuation and filtering every word with
+    any(char.isdigit() for char in word)"""
+    return " ".join(
+        word
+        for word in text.translate(SENTENCE_TRANSLATION).split()
+        if not any(char.isdigit() for char in word)
+    )
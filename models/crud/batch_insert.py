@@ -0,0 +1,251 @@
+import logging
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import config
+from models.crud.insert import Insert
+from models.crud.lru_cache import normtoken_ids, rawtoken_ids
+from models.exceptions import MissingInformationError
+from models.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# A rawtoken is identified the same way as in Read.get_rawtoken_id
+RawtokenKey = Tuple[str, int]  # (text, lexical_category)
+# Reads the latest committed rows instead of the transaction snapshot
+LOCKING_READ = "LOCK IN SHARE MODE"
+
+
+@instrumented
+class BatchInsert(Insert):
+    """Bulk write path for rawtokens, normtokens and their links
+
+    Rows are accumulated per document and written with multi-row
+    statements via executemany. We commit once per flush instead of
+    once per row. A flush happens when flush_size rows are pending
+    and when the document is done. A worker has a BatchInsert for every
+    document in flight in nlp.pipe, so we only borrow a connection from
+    the pool while we flush.
+
+    IDs are resolved by joining the pending keys against the table
+    so the database collation decides which texts are equal,
+    just like in the per-row path.
+
+    Other workers insert the same tokens concurrently. Our first SELECT
+    opens a REPEATABLE READ snapshot which does not show the rows they
+    commit after it, so after inserting we look the ids up again with
+    a locking read which always sees the latest committed rows."""
+
+    flush_size: int = config.ingest_flush_size
+    # How many keys we resolve per SELECT
+    lookup_size: int = 500
+    rawtokens: Dict[RawtokenKey, Tuple[int, str, int, int]] = dict()
+    normtokens: Set[str] = set()
+    rawtoken_normtoken_links: Set[Tuple[RawtokenKey, str]] = set()
+    sentence_rawtoken_links: Set[Tuple[int, RawtokenKey]] = set()
+    flush_count: int = 0
+
+    @property
+    def number_of_pending_rows(self) -> int:
+        return (
+            len(self.rawtokens)
+            + len(self.normtokens)
+            + len(self.rawtoken_normtoken_links)
+            + len(self.sentence_rawtoken_links)
+        )
+
+    @staticmethod
+    def rawtoken_key(token: Any) -> RawtokenKey:
+        return token.rawtoken, token.pos_id
+
+    def add_token(self, token: Any):
+        key = self.rawtoken_key(token=token)
+        if key not in self.rawtokens:
+            # The first occurrence decides language and score
+            # like the per-row path where the first insert wins
+            self.rawtokens[key] = (
+                token.pos_id,
+                token.rawtoken,
+                token.sentence.language_id,
+                token.sentence.score_id,
+            )
+        self.normtokens.add(token.normalized_token)
+        self.rawtoken_normtoken_links.add((key, token.normalized_token))
+        self.flush_if_full()
+
+    def add_sentence_links(self, sentence: Any, sentence_id: int):
+        for token in sentence.accepted_tokens:
+            self.sentence_rawtoken_links.add(
+                (sentence_id, self.rawtoken_key(token=token))
+            )
+        self.flush_if_full()
+
+    def flush_if_full(self):
+        if self.number_of_pending_rows >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """Write everything pending in one transaction"""
+        if not self.number_of_pending_rows:
+            return
+        logger.debug(f"Flushing {self.number_of_pending_rows} rows")
+        self.connect_and_setup()
+        try:
+            rawtoken_id_of = self.__insert_rawtokens()
+            normtoken_id_of = self.__insert_normtokens()
+            self.cursor.executemany(
+                """
+                INSERT IGNORE INTO rawtoken_normtoken_linking (normtoken, rawtoken)
+                VALUES (%s, %s)
+                """,
+                sorted(
+                    (normtoken_id_of[normtoken], rawtoken_id_of[key])
+                    for key, normtoken in self.rawtoken_normtoken_links
+                ),
+            )
+            self.cursor.executemany(
+                """
+                INSERT IGNORE INTO rawtoken_sentence_linking (sentence, rawtoken)
+                VALUES (%s, %s)
+                """,
+                sorted(
+                    (sentence_id, rawtoken_id_of[key])
+                    for sentence_id, key in self.sentence_rawtoken_links
+                ),
+            )
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            super().close_db()
+        self.flush_count += 1
+        self.rawtokens = dict()
+        self.normtokens = set()
+        self.rawtoken_normtoken_links = set()
+        self.sentence_rawtoken_links = set()
+
+    def __insert_rawtokens(self) -> Dict[RawtokenKey, int]:
+        keys = set(self.rawtokens)
+        keys.update(key for key, _ in self.rawtoken_normtoken_links)
+        keys.update(key for _, key in self.sentence_rawtoken_links)
+        ids = self.get_rawtoken_ids(keys=keys)
+        # Sorted so concurrent workers take row locks in the same order
+        missing = sorted(
+            self.rawtokens[key]
+            for key in keys
+            if key not in ids and key in self.rawtokens
+        )
+        if missing:
+            self.cursor.executemany(
+                """
+                INSERT INTO rawtoken (lexical_category, text, language, score)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = id
+                """,
+                missing,
+            )
+            ids.update(
+                self.get_rawtoken_ids(
+                    keys=[key for key in keys if key not in ids], locking=True
+                )
+            )
+        self.__check_all_found(table="rawtoken", keys=keys, ids=ids)
+        return ids
+
+    def __insert_normtokens(self) -> Dict[str, int]:
+        texts = set(self.normtokens)
+        ids = self.get_normtoken_ids(texts=texts)
+        missing = sorted((text,) for text in texts if text not in ids)
+        if missing:
+            self.cursor.executemany(
+                """
+                INSERT INTO normtoken (text)
+                VALUES (%s)
+                ON DUPLICATE KEY UPDATE id = id
+                """,
+                missing,
+            )
+            ids.update(
+                self.get_normtoken_ids(
+                    texts=[text for text in texts if text not in ids], locking=True
+                )
+            )
+        self.__check_all_found(table="normtoken", keys=texts, ids=ids)
+        return ids
+
+    @staticmethod
+    def __check_all_found(table: str, keys: Iterable[Any], ids: Dict[Any, int]):
+        missing = [key for key in keys if key not in ids]
+        if missing:
+            raise MissingInformationError(
+                f"Found no {table} id for {len(missing)} keys after inserting them, "
+                f"e.g. {missing[0]!r}"
+            )
+
+    def get_rawtoken_ids(
+        self, keys: Iterable[RawtokenKey], locking: bool = False
+    ) -> Dict[RawtokenKey, int]:
+        """The keys are joined as a derived table so we get
+        them back exactly as we sent them"""
+        ids: Dict[RawtokenKey, int] = dict()
+        uncached = list()
+        for key in keys:
+            rowid = rawtoken_ids.get(key)
+            if rowid is None:
+                uncached.append(key)
+            else:
+                ids[key] = rowid
+        for batch in self.__batches(uncached):
+            derived = " UNION ALL ".join(
+                ["SELECT %s AS text, %s AS lexical_category"] * len(batch)
+            )
+            query = f"""
+                SELECT k.text, k.lexical_category, rawtoken.id
+                FROM ({derived}) AS k
+                JOIN rawtoken ON rawtoken.text = k.text
+                AND rawtoken.lexical_category = k.lexical_category
+                ORDER BY rawtoken.id
+                {LOCKING_READ if locking else ""}
+            """
+            self.cursor.execute(query, [value for key in batch for value in key])
+            for text, lexical_category, id_ in self.cursor.fetchall():
+                key = (text, int(lexical_category))
+                if key not in ids:
+                    ids[key] = id_
+                    rawtoken_ids.put(key, id_)
+        return ids
+
+    def get_normtoken_ids(
+        self, texts: Iterable[str], locking: bool = False
+    ) -> Dict[str, int]:
+        ids: Dict[str, int] = dict()
+        uncached = list()
+        for text in texts:
+            rowid = normtoken_ids.get(text)
+            if rowid is None:
+                uncached.append(text)
+            else:
+                ids[text] = rowid
+        for batch in self.__batches(uncached):
+            derived = " UNION ALL ".join(["SELECT %s AS text"] * len(batch))
+            query = f"""
+                SELECT k.text, normtoken.id
+                FROM ({derived}) AS k
+                JOIN normtoken ON normtoken.text = k.text
+                ORDER BY normtoken.id
+                {LOCKING_READ if locking else ""}
+            """
+            self.cursor.execute(query, batch)
+            for text, id_ in self.cursor.fetchall():
+                if text not in ids:
+                    ids[text] = id_
+                    normtoken_ids.put(text, id_)
+        return ids
+
+    def __batches(self, items: List[Any]) -> Iterable[List[Any]]:
+        for start in range(0, len(items), self.lookup_size):
+            yield items[start : start + self.lookup_size]
+
+    def close_db(self) -> None:
+        """Write what is pending, we hold no connection between flushes"""
+        self.flush()
@@ -1,19 +1,28 @@
 import logging
 
-from models.crud.database_handler import Mariadb
+from models.crud.database_handler import Mariadb, get_backend
 from models.crud.insert import Insert
+from models.crud.lookup_tables import lookup_tables
+from models.instrumentation import instrumented
 
 logger = logging.getLogger(__name__)
 
+# Sentence.text_hash of the text column, it approximates
+# models.sentence.hash_text, see there
+TEXT_HASH_SQL = "UNHEX(SHA1(LOWER(TRIM(TRAILING ' ' FROM text))))"
 
+
+@instrumented
 class Create(Mariadb):
     def connect_and_setup(self):
         self.connect_to_mariadb()
         self.initialize_mariadb_cursor()
         self.create_tables()
+        self.migrate_tables()
         self.create_indexes()
         self.insert_languages_and_lexical_categories_from_config()
         self.commit_to_database()
+        lookup_tables.load(cursor=self.cursor)
 
     @staticmethod
     def insert_languages_and_lexical_categories_from_config():
@@ -74,6 +83,7 @@ class Create(Mariadb):
                 dataset SMALLINT UNSIGNED NOT NULL,
                 external_id VARCHAR(255) NOT NULL,
                 processed BOOL DEFAULT FALSE,
+                processed_offset INT UNSIGNED NOT NULL DEFAULT 0,
                 FOREIGN KEY (dataset) REFERENCES dataset(id),
                 UNIQUE(dataset, external_id)
             );
@@ -85,11 +95,13 @@ class Create(Mariadb):
             """CREATE TABLE IF NOT EXISTS sentence (
                 id INT UNSIGNED PRIMARY KEY AUTO_INCREMENT,
                 text TEXT NOT NULL,
+                -- SHA1 of the text, see Sentence.text_hash
+                text_hash BINARY(20) NOT NULL,
                 uuid VARCHAR(36) NOT NULL UNIQUE,
                 document SMALLINT UNSIGNED NOT NULL,
                 score SMALLINT UNSIGNED NOT NULL,
                 language SMALLINT UNSIGNED NOT NULL,
-                UNIQUE (text, document, language),
+                UNIQUE KEY uq_sentence_text_hash (text_hash, document, language),
                 FOREIGN KEY (document) REFERENCES document(id),
                 FOREIGN KEY(language) REFERENCES language(id),
                 FOREIGN KEY(score) REFERENCES score(id)
@@ -158,6 +170,45 @@ class Create(Mariadb):
             logger.debug(f"execuring: {query}")
             self.cursor.execute(query)
 
+    def migrate_tables(self):
+        """Bring tables created by earlier versions up to date"""
+        if get_backend().name == "sqlite":
+            # SQLite databases were always created with the current schema
+            return
+        logger.info("Migrating tables")
+        sql_commands = [
+            # Chunk level checkpoint, see Document.checkpoint_chunk
+            """ALTER TABLE document
+            ADD COLUMN IF NOT EXISTS processed_offset INT UNSIGNED NOT NULL DEFAULT 0;
+            """,
+        ]
+        for query in sql_commands:
+            logger.debug(f"execuring: {query}")
+            self.cursor.execute(query)
+        self.migrate_sentence_text_hash()
+
+    def migrate_sentence_text_hash(self):
+        """Replace the unique key over the full sentence text
+        with one over a fixed width hash of it
+
+        This rewrites the whole sentence table so we only do it once"""
+        self.cursor.execute("SHOW COLUMNS FROM sentence LIKE 'text_hash'")
+        if self.cursor.fetchone():
+            return
+        print("Adding text_hash to the sentence table, this can take a while")
+        sql_commands = [
+            "ALTER TABLE sentence ADD COLUMN text_hash BINARY(20) NULL AFTER text;",
+            f"UPDATE sentence SET text_hash = {TEXT_HASH_SQL};",
+            """ALTER TABLE sentence
+            MODIFY text_hash BINARY(20) NOT NULL,
+            ADD UNIQUE KEY uq_sentence_text_hash (text_hash, document, language),
+            DROP INDEX IF EXISTS text;
+            """,
+        ]
+        for query in sql_commands:
+            logger.debug(f"execuring: {query}")
+            self.cursor.execute(query)
+
     def create_indexes(self):
         """These indexes enable us to fast lookup of sentences
         in a given language, document or with a given UUID"""
@@ -1,15 +1,192 @@
 import logging
-from typing import Dict, Any
+import os
+from abc import ABC, abstractmethod
+import threading
+from time import monotonic
+from typing import Dict, Any, List, Tuple
 
 import pymysql
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pymysql.connections import Connection
+from pymysql.constants.SERVER_STATUS import SERVER_STATUS_IN_TRANS
 from pymysql.cursors import Cursor
 
+import config
+from models.crud.timed_cursor import TimedCursor
+from models.instrumentation import instrumented
+
 logger = logging.getLogger(__name__)
 
 
+class ConnectionPool(BaseModel):
+    """Process-wide pool of connections to the local database
+
+    The CRUD classes are short-lived and used several times per token,
+    so instead of paying the TCP and auth handshake every time we hand
+    out idle connections together with their cursor.
+
+    size is the number of idle connections we keep around. We never
+    block waiting for a connection because the models nest CRUD objects,
+    e.g. Token.analyze_and_insert holds a Read and an Insert at once."""
+
+    size: int = config.mariadb_pool_size
+    health_check_seconds: float = config.mariadb_pool_health_check_seconds
+    idle: List[Tuple[Connection, Cursor, float]] = list()
+    pid: int = 0
+    created_count: int = 0
+    reused_count: int = 0
+    lock: Any = Field(default_factory=threading.Lock)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @staticmethod
+    def connect(local_infile: bool = False) -> Connection:
+        """Connect to a local database
+
+        local_infile is needed for LOAD DATA LOCAL INFILE, see OfflineLoader"""
+        try:
+            connection = pymysql.connect(
+                host=config.mariadb_host,
+                user=config.mariadb_user,
+                passwd=config.mariadb_password,
+                db=config.mariadb_database,
+                local_infile=local_infile,
+            )
+            logger.debug("succesfully connected to mariadb")
+            return connection
+        except pymysql.Error as e:
+            raise ConnectionError("Error: %s" % e)
+
+    def acquire(self) -> Tuple[Connection, Cursor]:
+        with self.lock:
+            self.__forget_connections_from_parent_process()
+            while self.idle:
+                connection, cursor, released_at = self.idle.pop()
+                if self.__is_healthy(connection=connection, released_at=released_at):
+                    self.reused_count += 1
+                    return connection, cursor
+            self.created_count += 1
+        connection = self.connect()
+        return connection, connection.cursor()
+
+    def release(self, connection: Connection, cursor: Cursor) -> None:
+        if connection is None or not connection.open:
+            return
+        if connection.server_status & SERVER_STATUS_IN_TRANS:
+            # End the transaction so the next user does not
+            # get a stale snapshot or our uncommitted writes
+            connection.rollback()
+        with self.lock:
+            if self.pid == os.getpid() and len(self.idle) < self.size:
+                self.idle.append((connection, cursor, monotonic()))
+                return
+        connection.close()
+
+    def close_all(self) -> None:
+        with self.lock:
+            idle, self.idle = self.idle, list()
+        for connection, _, _ in idle:
+            connection.close()
+
+    def __forget_connections_from_parent_process(self) -> None:
+        """Sockets inherited through fork are shared with the parent,
+        so we drop them without closing and start over"""
+        pid = os.getpid()
+        if self.pid != pid:
+            self.idle = list()
+            self.pid = pid
+
+    def __is_healthy(self, connection: Connection, released_at: float) -> bool:
+        if monotonic() - released_at < self.health_check_seconds:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except pymysql.Error as e:
+            logger.debug(f"Discarding broken pooled connection: {e}")
+            return False
+
+
+connection_pool = ConnectionPool()
+
+
+class Backend(BaseModel, ABC):
+    """Where the CRUD classes get their connection and cursor from
+
+    The CRUD classes write MariaDB SQL. A backend hands out a
+    connection and a cursor that understand it, see SqliteBackend
+    for one that translates it."""
+
+    name: str = ""
+
+    @abstractmethod
+    def acquire(self) -> Tuple[Any, Any]:
+        pass
+
+    @abstractmethod
+    def release(self, connection: Any, cursor: Any) -> None:
+        pass
+
+    @abstractmethod
+    def close_all(self) -> None:
+        pass
+
+
+class MariadbBackend(Backend):
+    """MariaDB through the process-wide connection pool"""
+
+    name: str = "mariadb"
+    pool: Any = None
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.pool is None:
+            self.pool = connection_pool
+
+    def acquire(self) -> Tuple[Connection, Cursor]:
+        return self.pool.acquire()
+
+    def release(self, connection: Connection, cursor: Cursor) -> None:
+        self.pool.release(connection=connection, cursor=cursor)
+
+    def close_all(self) -> None:
+        self.pool.close_all()
+
+
+def create_backend() -> Backend:
+    """The backend chosen in config.database_backend"""
+    if config.database_backend == "sqlite":
+        # Imported here because the SQLite module builds on this one
+        from models.crud.sqlite import SqliteBackend
+
+        return SqliteBackend(path=config.sqlite_path)
+    if config.database_backend == "mariadb":
+        return MariadbBackend()
+    raise ValueError(f"unknown database backend '{config.database_backend}'")
+
+
+backend: Backend = create_backend()
+
+
+def get_backend() -> Backend:
+    return backend
+
+
+def use_backend(new_backend: Backend) -> Backend:
+    """Switch backend, e.g. to a temporary SQLite file in tests.
+    Returns the previous backend."""
+    global backend
+    previous, backend = backend, new_backend
+    return previous
+
+
+@instrumented
 class Mariadb(BaseModel):
+    """Base class of the CRUD classes
+
+    The name is historical, the connection comes from the configured
+    backend which can also be SQLite."""
+
     lexical_categories: Dict[Any, Any] = dict()
     languages: Dict[Any, Any] = dict()
     ner_labels: Dict[Any, Any] = dict()
@@ -18,8 +195,8 @@ class Mariadb(BaseModel):
     named_entity_recognition_labels_config_path: str = (
         "config/named_entity_recognition_labels.yml"
     )
-    connection: Connection = None
-    cursor: Cursor = None
+    connection: Any = None
+    cursor: Any = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -33,28 +210,24 @@ class Mariadb(BaseModel):
         self.initialize_mariadb_cursor()
 
     def connect_to_mariadb(self):
-        """Connect to a local database"""
-        # Connection parameters
-        host = "localhost"
-        user = "riksdagen"
-        password = "password"
-        database = "riksdagen"
-
-        # Connect to the database
-        try:
-            self.connection = pymysql.connect(
-                host=host, user=user, passwd=password, db=database
-            )
-            logger.debug("succesfully connected to mariadb")
-
-        except pymysql.Error as e:
-            raise ConnectionError("Error: %s" % e)
+        """Borrow a connection to the database from the backend"""
+        self.connection, self.cursor = backend.acquire()
 
     def initialize_mariadb_cursor(self) -> None:
-        self.cursor = self.connection.cursor()
+        if self.cursor is None:
+            self.cursor = self.connection.cursor()
+        if not isinstance(self.cursor, TimedCursor):
+            self.cursor = TimedCursor(cursor=self.cursor)
 
     def commit_to_database(self) -> None:
         self.connection.commit()
 
     def close_db(self) -> None:
-        self.connection.close()
+        """Hand the connection back to the backend"""
+        cursor = self.cursor
+        if isinstance(cursor, TimedCursor):
+            # The pool keeps the cursor of the backend, we wrap it on every borrow
+            cursor = cursor.cursor
+        backend.release(connection=self.connection, cursor=cursor)
+        self.connection = None
+        self.cursor = None
@@ -1,6 +1,8 @@
 from models.crud.database_handler import Mariadb
+from models.instrumentation import instrumented
 
 
+@instrumented
 class Delete(Mariadb):
     # TODO delete rawtokens and normtokens with unaccepted chars
     # TODO delete garbage sentences with unaccepted token chars
@@ -4,10 +4,14 @@ from typing import Any
 import yaml
 
 from models.crud.database_handler import Mariadb
+from models.crud.lookup_tables import lookup_tables
+from models.crud.lru_cache import normtoken_ids, rawtoken_ids
+from models.instrumentation import instrumented
 
 logger = logging.getLogger(__name__)
 
 
+@instrumented
 class Insert(Mariadb):
     def insert_languages(self):
         logger.debug("Inserting languages from YAML")
@@ -78,17 +82,23 @@ class Insert(Mariadb):
 
     def insert_document(self, document: Any):
         logger.info("Adding document to database")
-        query = "INSERT INTO document (external_id, dataset) VALUES (%s, %s)"
+        query = """
+        INSERT IGNORE INTO document (external_id, dataset)
+        VALUES (%s, %s)
+        """
         values = (document.external_id, document.dataset_id)
         self.cursor.execute(query, values)
         self.commit_to_database()
         logger.debug("Document added to the database.")
 
     def insert_rawtoken(self, token: Any):
+        # Another worker might have inserted the same rawtoken since we
+        # looked it up, LAST_INSERT_ID(id) gives us the existing id then
         query = """
         INSERT INTO rawtoken 
         (lexical_category, text, language, score)
-        VALUES (%s, %s, %s, %s);
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id);
         """
         params = (
             token.pos_id,
@@ -98,15 +108,17 @@ class Insert(Mariadb):
         )
         self.cursor.execute(query, params)
         self.commit_to_database()
+        rawtoken_ids.put((token.rawtoken, token.pos_id), self.cursor.lastrowid)
         logger.debug("rawtoken inserted")
 
     def insert_sentence(self, sentence: Any) -> int:
         query = """
-        INSERT INTO sentence (text, uuid, document, language, score)
-        VALUES (%s, %s, %s, %s, %s);
+        INSERT INTO sentence (text, text_hash, uuid, document, language, score)
+        VALUES (%s, %s, %s, %s, %s, %s);
         """
         params = (
             sentence.text,
+            sentence.text_hash,
             sentence.uuid,
             sentence.document.id,
             sentence.language_id,
@@ -120,7 +132,8 @@ class Insert(Mariadb):
     def insert_entity(self, entity: Any) -> int:
         query = """
         INSERT INTO entity (label, ner_label)
-        VALUES (%s, %s);
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id);
         """
         params = (entity.label, entity.ner_label_id)
         self.cursor.execute(query, params)
@@ -142,10 +155,12 @@ class Insert(Mariadb):
         query = """
         INSERT INTO score (value)
         VALUES (%s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
         """
         params = (sentence.score,)
         self.cursor.execute(query, params)
         self.commit_to_database()
+        lookup_tables.set_score_id(score=sentence.score, id_=self.cursor.lastrowid)
         logger.debug("score inserted")
 
     def link_sentence_to_rawtokens(self, sentence: Any):
@@ -163,11 +178,13 @@ class Insert(Mariadb):
         query = """
         INSERT INTO normtoken 
         (text)
-        VALUES (%s);
+        VALUES (%s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id);
         """
         params = (token.normalized_token,)
         self.cursor.execute(query, params)
         self.commit_to_database()
+        normtoken_ids.put(token.normalized_token, self.cursor.lastrowid)
         logger.debug("normtoken inserted")
 
     def link_normtoken_to_rawtoken(self, token: Any):
@@ -0,0 +1,56 @@
+import logging
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class LookupTables(BaseModel):
+    """In-memory copies of the small, nearly static dimension tables
+
+    score, language, lexical_category and ner_label are read for every
+    token, so we load them once when the database has been set up and
+    write new rows through when we insert them. A miss falls back to
+    the database and the result is stored here."""
+
+    scores: Dict[float, int] = dict()
+    languages: Dict[str, int] = dict()
+    lexical_categories: Dict[str, int] = dict()
+    ner_labels: Dict[str, int] = dict()
+
+    @staticmethod
+    def score_key(score: float) -> float:
+        """Scores are compared with two decimals in the database"""
+        return round(float(score), 2)
+
+    def load(self, cursor: Any) -> None:
+        cursor.execute("SELECT value, id FROM score")
+        self.scores = {self.score_key(value): id_ for value, id_ in cursor.fetchall()}
+        cursor.execute("SELECT iso_code, id FROM language")
+        self.languages = {code: id_ for code, id_ in cursor.fetchall()}
+        cursor.execute("SELECT postag, id FROM lexical_category")
+        self.lexical_categories = {postag: id_ for postag, id_ in cursor.fetchall()}
+        cursor.execute("SELECT label, id FROM ner_label")
+        self.ner_labels = {label: id_ for label, id_ in cursor.fetchall()}
+        logger.info(
+            f"Loaded lookup tables: {len(self.scores)} scores, "
+            f"{len(self.languages)} languages, "
+            f"{len(self.lexical_categories)} lexical categories and "
+            f"{len(self.ner_labels)} ner labels"
+        )
+
+    def clear(self) -> None:
+        self.scores = dict()
+        self.languages = dict()
+        self.lexical_categories = dict()
+        self.ner_labels = dict()
+
+    def get_score_id(self, score: float) -> Optional[int]:
+        return self.scores.get(self.score_key(score))
+
+    def set_score_id(self, score: float, id_: int) -> None:
+        self.scores[self.score_key(score)] = id_
+
+
+lookup_tables = LookupTables()
@@ -0,0 +1,68 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from pydantic import BaseModel
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class LruCache(BaseModel):
+    """Bounded least recently used cache with hit and miss counters
+
+    Swedish parliamentary text follows a Zipf distribution where a few
+    thousand forms cover most tokens, so a modest cache in front of the
+    ID lookups avoids most round-trips to the database."""
+
+    name: str
+    max_entries: int
+    entries: Any = None
+    hits: int = 0
+    misses: int = 0
+
+    def model_post_init(self, __context: Any) -> None:
+        self.entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not value:
+            # We never cache a missing id
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def print_statistics(self):
+        print(
+            f"{self.name} id cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.1%} hit rate), "
+            f"{len(self)}/{self.max_entries} entries"
+        )
+
+
+rawtoken_ids = LruCache(name="rawtoken", max_entries=config.rawtoken_id_cache_size)
+normtoken_ids = LruCache(name="normtoken", max_entries=config.normtoken_id_cache_size)
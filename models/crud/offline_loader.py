@@ -0,0 +1,294 @@
+import logging
+import os
+import re
+from typing import Dict, Iterator, List, Tuple
+
+from models.crud.database_handler import ConnectionPool, Mariadb, get_backend
+from models.file_sink import COMPLETE_MARKER, FILES, LOADED_MARKER
+from models.instrumentation import instrumented
+from models.tsv import format_row
+from models.vocabulary import Vocabulary
+
+logger = logging.getLogger(__name__)
+
+# Column types of the temporary staging tables
+STAGING_COLUMNS = {
+    "id": "INT UNSIGNED PRIMARY KEY",
+    "external_id": "VARCHAR(255)",
+    "document": "VARCHAR(255)",
+    "uuid": "VARCHAR(36)",
+    "text": "TEXT",
+    "text_hash": "CHAR(40)",
+    "language": "VARCHAR(30)",
+    "score": "FLOAT",
+    "lexical_category": "VARCHAR(30)",
+    "rawtoken": "INT UNSIGNED",
+    "normtoken": "INT UNSIGNED",
+    "label": "VARCHAR(255)",
+    "ner_label": "VARCHAR(30)",
+    "local": "INT UNSIGNED PRIMARY KEY",
+    "vocabulary": "INT UNSIGNED NOT NULL",
+}
+# Staged per dataset, the merged vocabularies of all its shards
+VOCABULARY_FILES = {
+    "rawtoken_vocabulary": FILES["rawtokens"],
+    "normtoken_vocabulary": FILES["normtokens"],
+}
+# Staged per shard, how its vocabulary ids map to the merged ones
+REMAP_FILES = {
+    "rawtoken_remap": ("local", "vocabulary"),
+    "normtoken_remap": ("local", "vocabulary"),
+}
+SHARD_FILES = ("documents", "sentences", "entities", "sentence_entity")
+LINK_FILES = ("rawtoken_normtoken", "sentence_rawtoken")
+
+# Tokens are inserted once per dataset and every vocabulary id is
+# mapped to its database id with a single join on the natural key
+VOCABULARY_QUERIES = [
+    """
+    INSERT IGNORE INTO score (value)
+    SELECT DISTINCT score FROM staging_rawtoken_vocabulary
+    """,
+    """
+    INSERT IGNORE INTO rawtoken (lexical_category, text, language, score)
+    SELECT lexical_category.id, x.text, language.id, score.id
+    FROM staging_rawtoken_vocabulary AS x
+    JOIN lexical_category ON lexical_category.postag = x.lexical_category
+    JOIN language ON language.iso_code = x.language
+    JOIN score ON score.value = x.score
+    """,
+    """
+    INSERT IGNORE INTO normtoken (text)
+    SELECT text FROM staging_normtoken_vocabulary
+    """,
+    """
+    CREATE TEMPORARY TABLE rawtoken_ids (
+        vocabulary INT UNSIGNED PRIMARY KEY, id INT UNSIGNED NOT NULL
+    )
+    """,
+    """
+    INSERT INTO rawtoken_ids (vocabulary, id)
+    SELECT x.id, rawtoken.id
+    FROM staging_rawtoken_vocabulary AS x
+    JOIN lexical_category ON lexical_category.postag = x.lexical_category
+    JOIN language ON language.iso_code = x.language
+    JOIN rawtoken ON rawtoken.text = x.text
+    AND rawtoken.lexical_category = lexical_category.id
+    AND rawtoken.language = language.id
+    """,
+    """
+    CREATE TEMPORARY TABLE normtoken_ids (
+        vocabulary INT UNSIGNED PRIMARY KEY, id INT UNSIGNED NOT NULL
+    )
+    """,
+    """
+    INSERT INTO normtoken_ids (vocabulary, id)
+    SELECT x.id, normtoken.id
+    FROM staging_normtoken_vocabulary AS x
+    JOIN normtoken ON normtoken.text = x.text
+    """,
+]
+
+# The links of a shard only join on integer ids
+SHARD_QUERIES = [
+    """
+    INSERT IGNORE INTO document (dataset, external_id)
+    SELECT %(dataset)s, external_id FROM staging_documents
+    """,
+    """
+    INSERT IGNORE INTO score (value)
+    SELECT DISTINCT score FROM staging_sentences
+    """,
+    """
+    INSERT IGNORE INTO rawtoken_normtoken_linking (rawtoken, normtoken)
+    SELECT rawtoken_ids.id, normtoken_ids.id
+    FROM staging_rawtoken_normtoken AS x
+    JOIN staging_rawtoken_remap AS r ON r.local = x.rawtoken
+    JOIN rawtoken_ids ON rawtoken_ids.vocabulary = r.vocabulary
+    JOIN staging_normtoken_remap AS n ON n.local = x.normtoken
+    JOIN normtoken_ids ON normtoken_ids.vocabulary = n.vocabulary
+    """,
+    """
+    INSERT IGNORE INTO sentence (text, text_hash, uuid, document, language, score)
+    SELECT x.text, UNHEX(x.text_hash), x.uuid, document.id, language.id, score.id
+    FROM staging_sentences AS x
+    JOIN document ON document.dataset = %(dataset)s
+    AND document.external_id = x.document
+    JOIN language ON language.iso_code = x.language
+    JOIN score ON score.value = x.score
+    """,
+    # Sentences we already had keep their uuid so their links are skipped here
+    """
+    INSERT IGNORE INTO rawtoken_sentence_linking (sentence, rawtoken)
+    SELECT sentence.id, rawtoken_ids.id
+    FROM staging_sentence_rawtoken AS x
+    JOIN sentence ON sentence.uuid = x.uuid
+    JOIN staging_rawtoken_remap AS r ON r.local = x.rawtoken
+    JOIN rawtoken_ids ON rawtoken_ids.vocabulary = r.vocabulary
+    """,
+    """
+    INSERT IGNORE INTO entity (label, ner_label)
+    SELECT x.label, ner_label.id
+    FROM staging_entities AS x
+    JOIN ner_label ON ner_label.label = x.ner_label
+    """,
+    """
+    INSERT IGNORE INTO sentence_entity_linking (sentence, entity)
+    SELECT sentence.id, entity.id
+    FROM staging_sentence_entity AS x
+    JOIN sentence ON sentence.uuid = x.uuid
+    JOIN ner_label ON ner_label.label = x.ner_label
+    JOIN entity ON entity.label = x.label AND entity.ner_label = ner_label.id
+    """,
+    """
+    UPDATE document
+    SET processed = TRUE
+    WHERE dataset = %(dataset)s
+    AND external_id IN (SELECT external_id FROM staging_documents)
+    """,
+]
+
+
+@instrumented
+class OfflineLoader(Mariadb):
+    """Bulk imports the TSV files written by FileSink
+
+    The token vocabularies of all waiting shards of a dataset are
+    merged in-process first, so every distinct token is inserted and
+    looked up once per dataset instead of once per shard. Then every
+    shard is loaded into temporary staging tables with LOAD DATA LOCAL
+    INFILE and copied into the real tables in one transaction. A LOADED
+    marker is written afterwards so shards can be loaded, and retried,
+    one at a time."""
+
+    def connect_to_mariadb(self):
+        if get_backend().name != "mariadb":
+            # E.g. SQLite in tests, which reads the files itself
+            super().connect_to_mariadb()
+            return
+        # LOAD DATA LOCAL needs a connection that allows it,
+        # so we do not borrow one from the pool
+        self.connection = ConnectionPool.connect(local_infile=True)
+
+    def close_db(self) -> None:
+        if get_backend().name != "mariadb":
+            super().close_db()
+            return
+        self.connection.close()
+        self.connection = None
+        self.cursor = None
+
+    @staticmethod
+    def iterate_datasets(directory: str) -> Iterator[Tuple[int, List[str]]]:
+        """Yield (dataset id, shard directories) of complete shards not yet loaded"""
+        if not os.path.isdir(directory):
+            return
+        for dataset_name in sorted(os.listdir(directory)):
+            match = re.fullmatch(r"dataset_(\d+)", dataset_name)
+            if not match:
+                continue
+            dataset_directory = os.path.join(directory, dataset_name)
+            shard_directories = [
+                os.path.join(dataset_directory, shard_name)
+                for shard_name in sorted(os.listdir(dataset_directory))
+                if os.path.isfile(
+                    os.path.join(dataset_directory, shard_name, COMPLETE_MARKER)
+                )
+                and not os.path.isfile(
+                    os.path.join(dataset_directory, shard_name, LOADED_MARKER)
+                )
+            ]
+            if shard_directories:
+                yield int(match.group(1)), shard_directories
+
+    def load_all(self, directory: str):
+        count = 0
+        for dataset_id, shard_directories in self.iterate_datasets(directory=directory):
+            self.load_dataset(
+                dataset_id=dataset_id,
+                dataset_directory=os.path.join(directory, f"dataset_{dataset_id}"),
+                shard_directories=shard_directories,
+            )
+            count += len(shard_directories)
+        print(f"Loaded {count} shards from {directory}")
+
+    def load_dataset(
+        self, dataset_id: int, dataset_directory: str, shard_directories: List[str]
+    ):
+        print(f"Merging the vocabularies of {len(shard_directories)} shards")
+        rawtokens = Vocabulary()
+        normtokens = Vocabulary()
+        for shard_directory in shard_directories:
+            self.write_remap(
+                path=os.path.join(shard_directory, "rawtoken_remap.tsv"),
+                remap=rawtokens.merge(
+                    Vocabulary.load(
+                        path=os.path.join(shard_directory, "rawtokens.tsv"),
+                        key_length=3,
+                    )
+                ),
+            )
+            self.write_remap(
+                path=os.path.join(shard_directory, "normtoken_remap.tsv"),
+                remap=normtokens.merge(
+                    Vocabulary.load(
+                        path=os.path.join(shard_directory, "normtokens.tsv"),
+                        key_length=1,
+                    )
+                ),
+            )
+        rawtokens.save(path=os.path.join(dataset_directory, "rawtoken_vocabulary.tsv"))
+        normtokens.save(
+            path=os.path.join(dataset_directory, "normtoken_vocabulary.tsv")
+        )
+        print(
+            f"Inserting {len(rawtokens)} rawtokens and "
+            f"{len(normtokens)} normtokens of dataset {dataset_id}"
+        )
+        for table in ("rawtoken_ids", "normtoken_ids"):
+            self.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+        for name, columns in VOCABULARY_FILES.items():
+            self.stage(name=name, columns=columns, directory=dataset_directory)
+        for query in VOCABULARY_QUERIES:
+            logger.debug(f"executing: {query}")
+            self.cursor.execute(query)
+        self.commit_to_database()
+        for shard_directory in shard_directories:
+            self.load_shard(dataset_id=dataset_id, shard_directory=shard_directory)
+
+    @staticmethod
+    def write_remap(path: str, remap: Dict[int, int]):
+        with open(path, "w", encoding="utf-8", newline="\n") as file:
+            for local, merged in remap.items():
+                file.write(format_row([local, merged]))
+
+    def stage(self, name: str, columns: Tuple[str, ...], directory: str):
+        """Load one TSV file into a temporary table"""
+        self.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS staging_{name}")
+        definition = ", ".join(
+            f"{column} {STAGING_COLUMNS[column]}" for column in columns
+        )
+        self.cursor.execute(f"CREATE TEMPORARY TABLE staging_{name} ({definition})")
+        self.cursor.execute(
+            f"""
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE staging_{name}
+            CHARACTER SET utf8mb4
+            ({', '.join(columns)})
+            """,
+            (os.path.abspath(os.path.join(directory, f"{name}.tsv")),),
+        )
+        logger.debug(f"Staged {self.cursor.rowcount} rows from {name}.tsv")
+
+    def load_shard(self, dataset_id: int, shard_directory: str):
+        print(f"Loading {shard_directory}")
+        for name in SHARD_FILES + LINK_FILES:
+            self.stage(name=name, columns=FILES[name], directory=shard_directory)
+        for name, columns in REMAP_FILES.items():
+            self.stage(name=name, columns=columns, directory=shard_directory)
+        for query in SHARD_QUERIES:
+            logger.debug(f"executing: {query}")
+            self.cursor.execute(query, {"dataset": dataset_id})
+        self.commit_to_database()
+        with open(os.path.join(shard_directory, LOADED_MARKER), "w"):
+            pass
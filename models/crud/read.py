@@ -1,21 +1,29 @@
 import logging
-from typing import Any, List, Tuple
+from typing import TYPE_CHECKING, Any, List, Set, Tuple
 
 import spacy
 
-from models.api import SentenceResult
-from models.api.sentence_result import SentenceAttributes
 from models.crud.database_handler import Mariadb
+from models.crud.lookup_tables import lookup_tables
+from models.crud.lru_cache import normtoken_ids, rawtoken_ids
 from models.exceptions import PostagError, MissingLanguageError, MissingInformationError
+from models.instrumentation import instrumented
+
+if TYPE_CHECKING:
+    from models.api.sentence_result import SentenceResult
 
 logger = logging.getLogger(__name__)
 
 
+@instrumented
 class Read(Mariadb):
     """Read methods and helper methods"""
 
     @staticmethod
-    def parse_into_sentence_results(results: Any) -> List[SentenceResult]:
+    def parse_into_sentence_results(results: Any) -> List["SentenceResult"]:
+        # Imported here to avoid a circular import with the API package
+        from models.api.sentence_result import SentenceAttributes, SentenceResult
+
         if results:
             sentence_results = list()
             for result in results:
@@ -121,7 +129,7 @@ class Read(Mariadb):
 
     def get_sentences_for_rawtoken_without_space(
         self, rawtoken_id: int, limit: int = 100, offset: int = 0
-    ) -> Tuple[int, List[SentenceResult]]:
+    ) -> Tuple[int, List["SentenceResult"]]:
         count = self.count_sentences_for_rawtoken_without_space(rawtoken_id=rawtoken_id)
         if count:
             query = """
@@ -133,9 +141,9 @@ class Read(Mariadb):
             ORDER BY LENGTH(sentence.text) ASC
             LIMIT %s OFFSET %s;
             """
-            prepared = self.cursor.mogrify(query, (rawtoken_id, limit, offset))
-            logger.debug(prepared)
-            self.cursor.execute(prepared)
+            params = (rawtoken_id, limit, offset)
+            logger.debug(self.cursor.mogrify(query, params))
+            self.cursor.execute(query, params)
             results = self.cursor.fetchall()
             return count, self.parse_into_sentence_results(results=results)
         else:
@@ -143,7 +151,7 @@ class Read(Mariadb):
 
     def get_sentences_for_compound_token(
         self, compound_token: str, language: str, limit: int = 100, offset: int = 0
-    ) -> Tuple[int, List[SentenceResult]]:
+    ) -> Tuple[int, List["SentenceResult"]]:
         """This is case-insensitive"""
         count = self.count_sentences_for_compound_token(language=language, compound_token=compound_token)
         if count:
@@ -176,6 +184,7 @@ class Read(Mariadb):
         else:
             rowid = result[0]
         logger.debug(f"Got lexical category rowid: {rowid}")
+        lookup_tables.lexical_categories[token.pos] = rowid
         return rowid
 
     def get_score(self, sentence: Any) -> int:
@@ -191,6 +200,7 @@ class Read(Mariadb):
         if result:
             score_id = result[0]
             logger.debug(f"Got score id: {score_id}")
+            lookup_tables.set_score_id(score=sentence.score, id_=score_id)
             return score_id
 
     def get_language(self, sentence: Any) -> int:
@@ -206,6 +216,7 @@ class Read(Mariadb):
         if result:
             rowid = result[0]
             logger.debug(f"Got language id: {rowid}")
+            lookup_tables.languages[code] = rowid
             return rowid
         else:
             raise MissingLanguageError(
@@ -234,10 +245,10 @@ class Read(Mariadb):
         query = """
             SELECT id
             FROM sentence
-            WHERE text = %s and document = %s and language = %s
+            WHERE text_hash = %s and document = %s and language = %s
         """
         params = (
-            sentence.text,
+            sentence.text_hash,
             sentence.document.id,
             sentence.language_id,
         )
@@ -249,6 +260,9 @@ class Read(Mariadb):
             return rowid
 
     def get_normtoken_id(self, token: Any):
+        rowid = normtoken_ids.get(token.normalized_token)
+        if rowid is not None:
+            return rowid
         query = """SELECT id
             FROM normtoken
             WHERE text = %s 
@@ -258,20 +272,51 @@ class Read(Mariadb):
         if result:
             rowid = result[0]
             logger.debug(f"Got normtoken id: {rowid}")
+            normtoken_ids.put(token.normalized_token, rowid)
             return rowid
 
     def get_rawtoken_id(self, token: Any):
+        key = (token.rawtoken, token.pos_id)
+        rowid = rawtoken_ids.get(key)
+        if rowid is not None:
+            return rowid
         query = """SELECT id
             FROM rawtoken
             WHERE text = %s and lexical_category = %s;
         """
-        self.cursor.execute(query, (token.rawtoken, token.pos_id))
+        self.cursor.execute(query, key)
         result = self.cursor.fetchone()
         if result:
             rowid = result[0]
             logger.debug(f"Got rawtoken id: {rowid}")
+            rawtoken_ids.put(key, rowid)
             return rowid
 
+    def get_processed_external_ids(self, dataset: Any) -> Set[str]:
+        """External ids of all documents in this dataset that are done"""
+        query = """SELECT external_id
+                    FROM document
+                    WHERE dataset = %s AND processed = TRUE;
+                """
+        self.cursor.execute(query, (dataset.id,))
+        external_ids = {row[0] for row in self.cursor.fetchall()}
+        logger.debug(f"Got {len(external_ids)} processed external ids")
+        return external_ids
+
+    def get_processed_offset(self, document: Any) -> int:
+        """Number of characters of the text of this document
+        that are fully inserted"""
+        query = """SELECT processed_offset
+                    FROM document
+                    WHERE id = %s;
+                """
+        self.cursor.execute(query, (document.id,))
+        result = self.cursor.fetchone()
+        if result:
+            logger.debug(f"Got processed offset: {result[0]}")
+            return int(result[0])
+        return 0
+
     def get_processed_status(self, document) -> bool:
         query = """SELECT processed
                     FROM document
@@ -294,6 +339,7 @@ class Read(Mariadb):
         if result:
             rowid = result[0]
             logger.debug(f"Got ner_label id: {rowid}")
+            lookup_tables.ner_labels[entity.ner_label] = rowid
             return rowid
         else:
             raise MissingInformationError(
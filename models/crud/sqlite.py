@@ -0,0 +1,174 @@
+import logging
+import os
+import re
+import sqlite3
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple
+
+from models.crud.database_handler import Backend
+from models.tsv import read_rows
+
+logger = logging.getLogger(__name__)
+
+# MariaDB idioms used by the CRUD classes and their SQLite equivalents
+UPSERT_RETURNING_ID = re.compile(
+    r"ON\s+DUPLICATE\s+KEY\s+UPDATE\s+id\s*=\s*LAST_INSERT_ID\(id\)", re.IGNORECASE
+)
+UPSERT_NOTHING = re.compile(
+    r"ON\s+DUPLICATE\s+KEY\s+UPDATE\s+id\s*=\s*id\b", re.IGNORECASE
+)
+INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+AUTO_INCREMENT_PRIMARY_KEY = re.compile(
+    r"\b\w*INT\s+UNSIGNED\s+"
+    r"(?:PRIMARY\s+KEY\s+AUTO_INCREMENT|AUTO_INCREMENT\s+PRIMARY\s+KEY)",
+    re.IGNORECASE,
+)
+UNSIGNED = re.compile(r"\s+UNSIGNED\b", re.IGNORECASE)
+NAMED_UNIQUE_KEY = re.compile(r"\bUNIQUE\s+KEY\s+(\w+)\s*\(", re.IGNORECASE)
+# Once we have written we hold the only write lock of the file,
+# so our reads already see every commit
+LOCKING_READ = re.compile(r"\s+LOCK\s+IN\s+SHARE\s+MODE\b", re.IGNORECASE)
+DROP_TEMPORARY_TABLE = re.compile(r"\bDROP\s+TEMPORARY\s+TABLE\b", re.IGNORECASE)
+# The statement OfflineLoader.stage uses, we read the file ourselves
+LOAD_DATA = re.compile(
+    r"LOAD\s+DATA\s+LOCAL\s+INFILE\s+%s\s+INTO\s+TABLE\s+(\w+)\s+"
+    r"CHARACTER\s+SET\s+\w+\s+\(([\w\s,]+)\)",
+    re.IGNORECASE,
+)
+PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+def replace_placeholder(match: re.Match) -> str:
+    if match.group(1):
+        return f":{match.group(1)}"
+    return "?" if match.group(0) == "%s" else "%"
+
+
+@lru_cache(maxsize=1024)
+def translate(query: str) -> Tuple[str, bool]:
+    """Return the SQLite version of a MariaDB query and whether
+    it returns the id that LAST_INSERT_ID(id) would have set"""
+    query = query.strip().rstrip(";")
+    returns_id = bool(UPSERT_RETURNING_ID.search(query))
+    query = UPSERT_RETURNING_ID.sub(
+        "ON CONFLICT DO UPDATE SET id = id RETURNING id", query
+    )
+    query = UPSERT_NOTHING.sub("ON CONFLICT DO NOTHING", query)
+    query = INSERT_IGNORE.sub("INSERT OR IGNORE", query)
+    # An INTEGER PRIMARY KEY is the rowid which SQLite assigns for us
+    query = AUTO_INCREMENT_PRIMARY_KEY.sub("INTEGER PRIMARY KEY AUTOINCREMENT", query)
+    query = UNSIGNED.sub("", query)
+    query = NAMED_UNIQUE_KEY.sub(r"CONSTRAINT \1 UNIQUE (", query)
+    query = LOCKING_READ.sub("", query)
+    # A temporary table shadows the table of the same name
+    query = DROP_TEMPORARY_TABLE.sub("DROP TABLE", query)
+    query = PLACEHOLDER.sub(replace_placeholder, query)
+    return query, returns_id
+
+
+def unhex(value: Optional[str]) -> Optional[bytes]:
+    """UNHEX of MariaDB, SQLite has it from 3.41"""
+    return None if value is None else bytes.fromhex(value)
+
+
+class SqliteCursor:
+    """Cursor that accepts the MariaDB SQL of the CRUD classes"""
+
+    __slots__ = ("cursor", "returned_id")
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self.cursor = cursor
+        self.returned_id: Optional[int] = None
+
+    def execute(self, query: str, params: Any = None) -> None:
+        load_data = LOAD_DATA.fullmatch(query.strip())
+        if load_data:
+            self.load_data(
+                path=params[0],
+                table=load_data.group(1),
+                columns=[column.strip() for column in load_data.group(2).split(",")],
+            )
+            return
+        sql, returns_id = translate(query)
+        self.cursor.execute(sql, () if params is None else params)
+        self.returned_id = None
+        if returns_id:
+            row = self.cursor.fetchone()
+            self.returned_id = row[0] if row else None
+
+    def executemany(self, query: str, params: Iterable[Any]) -> None:
+        sql, _ = translate(query)
+        self.cursor.executemany(sql, params)
+        self.returned_id = None
+
+    def load_data(self, path: str, table: str, columns: List[str]) -> None:
+        """LOAD DATA with the default escapes, see models/tsv.py"""
+        self.cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            read_rows(path=path),
+        )
+        self.returned_id = None
+
+    def fetchone(self) -> Optional[Tuple]:
+        return self.cursor.fetchone()
+
+    def fetchall(self) -> list:
+        return self.cursor.fetchall()
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        if self.returned_id is not None:
+            return self.returned_id
+        return self.cursor.lastrowid
+
+    @property
+    def rowcount(self) -> int:
+        return self.cursor.rowcount
+
+    @staticmethod
+    def mogrify(query: str, params: Any = None) -> str:
+        """Only for logging, SQLite has no client side interpolation"""
+        return f"{translate(query)[0]} {params}"
+
+    def close(self) -> None:
+        self.cursor.close()
+
+
+class SqliteBackend(Backend):
+    """SQLite in WAL mode for local runs, benchmarks and tests
+
+    The CRUD classes keep writing MariaDB SQL which we translate.
+    Every process opens the file once and shares that connection
+    between the CRUD objects. Unlike the default MariaDB collation,
+    text comparisons are case-sensitive here."""
+
+    name: str = "sqlite"
+    path: str
+    connection: Any = None
+    pid: int = 0
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        # MariaDB enforces foreign keys so we do as well
+        connection.execute("PRAGMA foreign_keys=ON")
+        connection.create_function("UNHEX", 1, unhex, deterministic=True)
+        logger.debug(f"succesfully connected to {self.path}")
+        return connection
+
+    def acquire(self) -> Tuple[sqlite3.Connection, SqliteCursor]:
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = self.connect()
+            self.pid = os.getpid()
+        return self.connection, SqliteCursor(cursor=self.connection.cursor())
+
+    def release(self, connection: Any, cursor: Any) -> None:
+        if cursor is not None:
+            cursor.close()
+
+    def close_all(self) -> None:
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
@@ -0,0 +1,77 @@
+import logging
+import re
+from functools import lru_cache
+from time import perf_counter
+from typing import Any, Callable
+
+import config
+from models.instrumentation import STATEMENT_PREFIX, instrumentation
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r"\s+")
+COMMENT = re.compile(r"--[^\n]*")
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+# BatchInsert builds one placeholder tuple or derived SELECT per row
+REPEATED_TUPLE = re.compile(r"(\([^()]*\))(?:, \1)+")
+REPEATED_UNION = re.compile(r"(SELECT [^()]*?)(?: UNION ALL \1)+")
+
+
+@lru_cache(maxsize=1024)
+def normalize(query: str) -> str:
+    """The statement without literals, placeholders and repeated rows
+    so that all executions of the same statement are counted together"""
+    query = COMMENT.sub(" ", query)
+    query = WHITESPACE.sub(" ", query).strip().rstrip(";").strip()
+    query = STRING_LITERAL.sub("?", query)
+    query = NUMBER_LITERAL.sub("?", query)
+    query = PLACEHOLDER.sub("?", query)
+    query = REPEATED_TUPLE.sub(r"\1, ...", query)
+    return REPEATED_UNION.sub(r"\1 UNION ALL ...", query)
+
+
+class TimedCursor:
+    """Wraps the cursor of a backend and times every statement
+
+    Mariadb installs this so all CRUD classes are covered. Each statement
+    is recorded by Instrumentation under its normalized SQL, which gives
+    the count and cumulative latency per statement. Statements slower
+    than slow_query_seconds are logged as warnings."""
+
+    __slots__ = ("cursor", "slow_query_seconds")
+
+    def __init__(
+        self, cursor: Any, slow_query_seconds: float = config.slow_query_seconds
+    ):
+        self.cursor = cursor
+        self.slow_query_seconds = slow_query_seconds
+
+    def __getattr__(self, name: str) -> Any:
+        # fetchone, fetchall, lastrowid, rowcount, mogrify, close...
+        return getattr(self.cursor, name)
+
+    def execute(self, query: str, params: Any = None) -> Any:
+        return self.run(method=self.cursor.execute, query=query, params=params)
+
+    def executemany(self, query: str, params: Any) -> Any:
+        return self.run(method=self.cursor.executemany, query=query, params=params)
+
+    def run(self, method: Callable, query: str, params: Any) -> Any:
+        statement = normalize(query)
+        enabled = instrumentation.enabled
+        start = instrumentation.start() if enabled else perf_counter()
+        try:
+            if params is None:
+                return method(query)
+            return method(query, params)
+        finally:
+            if enabled:
+                seconds = instrumentation.stop(
+                    name=STATEMENT_PREFIX + statement, start=start
+                )
+            else:
+                seconds = perf_counter() - start
+            if 0 < self.slow_query_seconds <= seconds:
+                logger.warning(f"Slow query took {seconds:.3f}s: {statement}")
@@ -2,10 +2,12 @@ import logging
 from typing import Any
 
 from models.crud.database_handler import Mariadb
+from models.instrumentation import instrumented
 
 logger = logging.getLogger(__name__)
 
 
+@instrumented
 class Update(Mariadb):
     def update_document_as_processed(self, document: Any):
         query = """UPDATE document
@@ -16,3 +18,15 @@ class Update(Mariadb):
         self.cursor.execute(query, params)
         self.commit_to_database()
         logger.debug("updated document as processed")
+
+    def update_document_processed_offset(self, document: Any):
+        query = """UPDATE document
+            SET processed_offset = %s
+            WHERE id = %s;
+        """
+        params = (document.processed_offset, document.id)
+        self.cursor.execute(query, params)
+        self.commit_to_database()
+        logger.debug(
+            f"updated document checkpoint to offset {document.processed_offset}"
+        )
@@ -1,12 +1,23 @@
-import json
 import logging
 import os
-from typing import Any
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
 
+import ijson
 from pydantic import BaseModel
 
+import config
 from models.crud.read import Read
 from models.document import Document
+from models.document_source import DocumentSource
+from models.file_sink import FileSink, shard_directory
+from models.instrumentation import instrumentation
+from models.language_cache import language_cache
+from models.language_detector import language_detector
+from models.pipelines import Pipelines
+from models.profiler import profiler
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +28,15 @@ class Dataset(BaseModel):
     id: int
     analyzer: Any = None
     max_documents_to_extract_per_dataset: int = 0
+    workers: int = 1
+    shard: int = 0  # which shard a worker process handles
+    skipped_documents_count: int = 0
+    already_processed_count: int = 0
+    processed_external_ids: Set[str] = set()
+    pipelines: Any = None
+    source: Optional[DocumentSource] = None
+    offline: bool = False  # write TSV files with FileSink instead of to MariaDB
+    sink: Optional[FileSink] = None
 
     @property
     def dataset_title(self):
@@ -41,68 +61,219 @@ class Dataset(BaseModel):
     #     ]
 
     def analyze(self):
+        instrumentation.start_dataset(dataset_id=self.id)
         self.__read_json_from_disk_and_extract()
         self.print_number_of_skipped_documents()
-        self.print_number_of_tokens()
+        self.print_number_of_already_processed_documents()
 
-    def __read_json_from_disk_and_extract(self):
-        logger.info("reading json from disk")
-        if not self.workdirectory:
-            raise ValueError("workdirectory was empty string")
-        file_paths = []
-        for root, dirs, files in os.walk(self.workdirectory):
-            for file in files:
-                if file.endswith(".json"):
-                    file_paths.append(os.path.join(root, file))
-
-        # logger.info(f"Number of filepaths found: {len(file_paths)}")
-        # logger.info(f"Number of filepaths after offset: {len(file_paths)}")
-        count = 1
-        for file_path in file_paths:
-            # Only break if max_documents_to_extract is different from 0
+    def print_number_of_already_processed_documents(self):
+        print(
+            f"Number of already processed documents skipped "
+            f"in dataset {self.id}: {self.already_processed_count}"
+        )
+
+    def fetch_processed_external_ids(self):
+        """One query per dataset lets us skip finished documents
+        without asking the database about every file"""
+        read = Read()
+        read.connect_and_setup()
+        self.processed_external_ids = read.get_processed_external_ids(dataset=self)
+        read.close_db()
+        print(
+            f"Found {len(self.processed_external_ids)} already processed "
+            f"documents in dataset {self.id}"
+        )
+
+    def print_number_of_skipped_documents(self):
+        print(
+            f"Number of skipped JSON files in dataset {self.id} "
+            f"(because of missing or bad data): {self.skipped_documents_count}"
+        )
+
+    def iterate_file_paths(self, workdirectory: str) -> Iterator[str]:
+        """Stream the file paths of this dataset, or of our shard
+        when we run in a worker process
+
+        The document limit applies per shard, with workers every
+        worker extracts up to that many documents"""
+        self.source = DocumentSource(
+            workdirectory=workdirectory,
+            skip_external_ids=self.processed_external_ids,
+        )
+        number = 0
+        for file_path in self.source.iterate_file_paths():
+            if (
+                self.workers > 1
+                and self.shard_of(file_path=file_path, workers=self.workers)
+                != self.shard
+            ):
+                continue
+            number += 1
             if (
                 self.max_documents_to_extract_per_dataset
-                and count >= self.max_documents_to_extract_per_dataset
+                and number > self.max_documents_to_extract_per_dataset
             ):
                 print("Max documents limit reached.")
                 break
-            with open(file_path, "r", encoding="utf-8-sig") as json_file:
-                # if count % 10 == 0 or count == 1:
-                print(f"Processing document {count}/{len(file_paths)}")
-                try:
-                    data = json.load(json_file)
-                    if (
-                        "dokumentstatus" in data
-                        and "dokument" in data["dokumentstatus"]
-                    ):
-                        dok_id = data["dokumentstatus"]["dokument"].get("dok_id")
-                        text = data["dokumentstatus"]["dokument"].get("text")
-                        html = data["dokumentstatus"]["dokument"].get("html")
-
-                        if dok_id is not None and (
-                            text is not None or html is not None
-                        ):
-                            # We got a good document with content
-                            document = Document(
-                                external_id=dok_id,
-                                dataset_id=self.id,
-                                text=text or "",
-                                html=html or "",
-                            )
-                            document.insert_extract_and_update()
-                        else:
-                            self.skipped_documents_count += 1
-                            logger.debug(
-                                f"Skipping document {json_file}: Missing dok_id and (text or html)"
-                            )
-                    else:
-                        logger.debug(
-                            f"Skipping document {json_file}: Missing 'dokumentstatus' or 'dokument'"
-                        )
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error loading JSON from {file_path}: {e}")
+            yield file_path
+
+    @staticmethod
+    def shard_of(file_path: str, workers: int) -> int:
+        """A file always lands in the same shard for a given number
+        of workers so that restarts resume the same work"""
+        return zlib.crc32(os.path.basename(file_path).encode("utf-8")) % workers
+
+    def __read_json_from_disk_and_extract(self):
+        logger.info("reading json from disk")
+        workdirectory = self.workdirectory
+        if self.workers > 1:
+            self.__extract_in_worker_processes(workdirectory=workdirectory)
+        else:
+            if self.pipelines is None:
+                self.pipelines = self.analyzer.pipelines
+            self.fetch_processed_external_ids()
+            self.extract_files(
+                file_paths=self.iterate_file_paths(workdirectory=workdirectory)
+            )
+
+    def __extract_in_worker_processes(self, workdirectory: str):
+        print(f"Distributing documents over {self.workers} workers")
+        # We spawn fresh processes so no spaCy model,
+        # fasttext model or database socket is shared
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    extract_shard,
+                    dataset_id=self.id,
+                    workdirectory=workdirectory,
+                    workers=self.workers,
+                    shard=shard,
+                    max_documents=self.max_documents_to_extract_per_dataset,
+                    offline=self.offline,
+                )
+                for shard in range(self.workers)
+            ]
+            for future in futures:
+                skipped_count, already_processed_count, metrics = future.result()
+                instrumentation.merge(dataset_id=self.id, snapshot=metrics)
+                self.skipped_documents_count += skipped_count
+                self.already_processed_count += already_processed_count
+
+    def extract_files(self, file_paths: Iterable[str]):
+        """Stream the chunks of all documents through one nlp.pipe
+
+        This lets spaCy batch many small documents together. Documents
+        stay in flight until their last chunk has been analyzed."""
+        if self.offline:
+            self.sink = FileSink(
+                directory=shard_directory(
+                    dataset_id=self.id, shard=self.shard, workers=self.workers
+                )
+            )
+            if self.sink.is_complete and not self.sink.is_loaded:
+                print(f"Skipping {self.sink.directory} which is waiting to be loaded")
+                return
+            self.sink.open()
+        nlp = self.pipelines.get()
+        documents_in_flight: Dict[int, Document] = dict()
+        chunks = self.__iterate_chunks(
+            file_paths=file_paths, documents_in_flight=documents_in_flight
+        )
+        # The nlp timer also runs while nlp.pipe pulls chunks from
+        # __iterate_chunks, the stages timed there are subtracted as nested
+        for doc, (document_number, is_last_chunk) in instrumentation.iterate(
+            name="nlp",
+            iterable=nlp.pipe(
+                chunks,
+                as_tuples=True,
+                batch_size=config.spacy_batch_size,
+                n_process=config.spacy_n_process,
+            ),
+        ):
+            document = documents_in_flight[document_number]
+            with instrumentation.document_scope(metrics=document.metrics):
+                document.analyze_chunk(doc=doc)
+                if is_last_chunk:
+                    del documents_in_flight[document_number]
+                    self.__finish_document(document=document)
+        if self.sink is not None:
+            self.sink.close()
+
+    def __iterate_chunks(
+        self, file_paths: Iterable[str], documents_in_flight: Dict[int, Document]
+    ) -> Iterator[Tuple[str, Tuple[int, bool]]]:
+        """Yield (chunk, context) tuples for nlp.pipe
+
+        The context only holds numbers because spaCy pickles it
+        when n_process is above 1"""
+        count = 1
+        for file_path in file_paths:
+            # if count % 10 == 0 or count == 1:
+            print(f"Processing document {count}")
+            document = self.read_document(file_path=file_path)
+            if document is not None:
+                with instrumentation.document_scope(metrics=document.metrics):
+                    if self.sink is None:
+                        document.insert_if_missing()
+                    document.prepare_extraction()
+                if document.number_of_remaining_chunks:
+                    documents_in_flight[count] = document
+                    last = document.number_of_remaining_chunks - 1
+                    for index, chunk in enumerate(document.cleaned_chunks()):
+                        yield chunk, (count, index == last)
+                else:
+                    with instrumentation.document_scope(metrics=document.metrics):
+                        self.__finish_document(document=document)
             count += 1
 
+    def __finish_document(self, document: Document):
+        document.finish_extraction()
+        if self.sink is not None:
+            self.sink.add_document(document=document)
+        else:
+            document.update_document()
+        instrumentation.finish_document(
+            external_id=document.external_id, metrics=document.metrics
+        )
+        profiler.document_finished()
+
+    def read_document(self, file_path: str) -> Optional[Document]:
+        try:
+            with instrumentation.timer(name="read_document"):
+                fields = self.source.read_fields(file_path=file_path)
+        except ijson.JSONError as e:
+            logger.error(f"Error loading JSON from {file_path}: {e}")
+            return None
+        if fields is None:
+            logger.debug(
+                f"Skipping document {file_path}: Missing 'dokumentstatus' or 'dokument'"
+            )
+            return None
+        dok_id = fields.get("dok_id")
+        if dok_id in self.processed_external_ids:
+            self.already_processed_count += 1
+            logger.debug(f"Skipping already processed document {dok_id}")
+            return None
+        text = fields.get("text")
+        html = fields.get("html")
+        if dok_id is not None and (text is not None or html is not None):
+            # We got a good document with content
+            return Document(
+                external_id=dok_id,
+                dataset_id=self.id,
+                text=text or "",
+                html=html or "",
+                sink=self.sink,
+            )
+        else:
+            self.skipped_documents_count += 1
+            logger.debug(
+                f"Skipping document {file_path}: Missing dok_id and (text or html)"
+            )
+            return None
+
     # def print_number_of_documents(self):
     #     # Print or use the variable containing all text
     #     print(f"number of documents: {len(self.documents)}")
@@ -110,3 +281,43 @@ class Dataset(BaseModel):
     # def print_number_of_tokens(self):
     #     # Print or use the variable containing all text
     #     print(f"Total number of tokens: {self.token_count}")
+
+
+def extract_shard(
+    dataset_id: int,
+    workdirectory: str,
+    workers: int,
+    shard: int,
+    max_documents: int,
+    offline: bool = False,
+) -> Tuple[int, int, Dict[str, Any]]:
+    """Entry point of a worker process
+
+    Every worker loads its own spaCy pipeline and uses its own
+    connection pool. Returns the number of skipped documents,
+    the number of already processed documents and the timings
+    of the worker."""
+    logging.basicConfig(level=config.loglevel)
+    instrumentation.start_dataset(dataset_id=dataset_id)
+    pipelines = Pipelines()
+    dataset = Dataset(
+        id=dataset_id,
+        pipelines=pipelines,
+        workers=workers,
+        shard=shard,
+        max_documents_to_extract_per_dataset=max_documents,
+        offline=offline,
+    )
+    dataset.fetch_processed_external_ids()
+    dataset.extract_files(
+        file_paths=dataset.iterate_file_paths(workdirectory=workdirectory)
+    )
+    pipelines.print_load_report()
+    language_detector.print_statistics()
+    language_cache.print_statistics()
+    language_cache.close()
+    return (
+        dataset.skipped_documents_count,
+        dataset.already_processed_count,
+        instrumentation.snapshot(dataset_id=dataset_id),
+    )
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Any, Dict, List
 
 import yaml
 from pydantic import BaseModel
@@ -14,6 +14,9 @@ class Datasets(BaseModel):
     datasets_config_path: str = "config/datasets.yml"
     max_documents_to_extract: int
     max_datasets_to_extract: int
+    workers: int = 1
+    offline: bool = False
+    analyzer: Any = None
 
     def setup(self):
         self.load_languages_from_yaml()
@@ -38,7 +41,11 @@ class Datasets(BaseModel):
         result = read.get_all_dataset_ids()
         for id_ in result:
             dataset = Dataset(
-                id=id_, max_documents_to_extract=self.max_documents_to_extract
+                id=id_,
+                analyzer=self.analyzer,
+                max_documents_to_extract_per_dataset=self.max_documents_to_extract,
+                workers=self.workers,
+                offline=self.offline,
             )
             self.datasets.append(dataset)
 
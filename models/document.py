@@ -1,14 +1,18 @@
 import logging
-from typing import List, Any
+from typing import Any, Iterator, List
 
-import spacy
 from spacy.language import Doc
-from bs4 import BeautifulSoup
 from pydantic import BaseModel
 
+import config
+from models.chunking import iterate_chunk_ends, iterate_chunks
+from models.crud.batch_insert import BatchInsert
 from models.crud.insert import Insert
 from models.crud.read import Read
 from models.crud.update import Update
+from models.html_text import html_to_text
+from models.instrumentation import Metrics, instrumentation
+from models.language_detector import language_detector
 from models.sentence import Sentence
 
 logger = logging.getLogger(__name__)
@@ -26,9 +30,16 @@ class Document(BaseModel):
     text: str = ""
     html: str = ""
     chunk_size: int = 100000  # this is because of a spacy limitation
-    chunks: List[str] = list()
+    chunk_ends: List[int] = list()  # end offset of every chunk in text
     accepted_sentences: List[Sentence] = list()
-    nlp: Any = None
+    # Characters of text that are fully inserted, stored in the
+    # database as a checkpoint when a chunk is done
+    processed_offset: int = 0
+    processed_chunks: int = 0
+    batch: Any = None  # BatchInsert when batched ingest is enabled
+    sink: Any = None  # FileSink when we extract offline to files
+    database_id: int = 0  # cached because it is read for every sentence
+    metrics: Metrics = Metrics()  # timings of this document, see Instrumentation
 
     class Config:
         arbitrary_types_allowed = True
@@ -36,11 +47,12 @@ class Document(BaseModel):
     @property
     def id(self) -> int:
         """ID of this document in the database"""
-        read = Read()
-        read.connect_and_setup()
-        data = read.get_document_id(document=self)
-        read.close_db()
-        return data
+        if not self.database_id:
+            read = Read()
+            read.connect_and_setup()
+            self.database_id = read.get_document_id(document=self) or 0
+            read.close_db()
+        return self.database_id
 
     def already_processed(self) -> bool:
         read = Read()
@@ -61,7 +73,7 @@ class Document(BaseModel):
     @property
     def number_of_chunks(self) -> int:
         # Count the number of chunks
-        return len(self.chunks)
+        return len(self.chunk_ends)
 
     @property
     def number_of_accepted_sentences(self) -> int:
@@ -84,69 +96,75 @@ class Document(BaseModel):
         return int(self.count_words / 450)
 
     def chunk_text(self):
-        """Function to chunk the text without splitting sentences"""
-        text_length = self.text_length
-        if text_length > self.chunk_size:
-            start = 0
-            while start < text_length:
-                # Find the end point ensuring it's a full stop
-                end = start + self.chunk_size
-
-                # Check if the end is within the text length
-                if end < text_length:
-                    # If the character at 'end' is not a full stop and we're not at the start,
-                    # keep moving 'end' backwards until a full stop is found or until reaching 'start'
-                    while self.text[end] != "." and end > start:
-                        end -= 1
-
-                # If there's no full stop found within the chunk size, chunk until self.chunk_size
-                if end == start:
-                    end = start + self.chunk_size
-
-                # Add the chunk to the list
-                self.chunks.append(self.text[start:end])
-
-                # Update 'start' for the next iteration, move beyond the last full stop found
-                start = end + 1 if end + 1 < text_length else text_length
-        else:
-            # Append the whole text
-            self.chunks.append(self.text)
+        """Find where to split the text so spaCy gets chunks it can handle
+
+        Only the end offsets are kept, the chunks are sliced from the
+        text when they are fed to spaCy, see models/chunking.py
+
+        When we resume, the text before the checkpoint counts as
+        one processed chunk and we chunk the rest from there"""
+        self.chunk_ends = list()
+        self.processed_chunks = 0
+        if self.processed_offset:
+            self.chunk_ends.append(self.processed_offset)
+            self.processed_chunks = 1
+        self.chunk_ends.extend(
+            iterate_chunk_ends(
+                text=self.text, chunk_size=self.chunk_size, start=self.processed_offset
+            )
+        )
 
     def convert_html_to_text(self):
-        # todo remove tables before conversion
-        # Check if HTML content exists for the document
-        soup = BeautifulSoup(self.html, "lxml")
-        # Extract text from the HTML
-        # TODO investigate how stripping affects the result
-        self.text = soup.get_text(separator=" ", strip=False)
+        """See config.html_converter for the parser we use"""
+        self.text = html_to_text(html=self.html)
 
     # def print_number_of_chunks(self):
     #     # Display the number of chunks
     #     logger.info(f"Number of chunks: " f"{self.number_of_chunks}")
 
-    def extract_sentences(self):
-        if not self.already_processed():
+    def prepare_extraction(self):
+        """Convert and chunk the text so the chunks can be fed to spaCy
+
+        Offline we only write files, Dataset already skipped
+        the documents that are processed"""
+        if self.sink is not None or not self.already_processed():
             if not self.text:
                 # We assume html is present
-                self.convert_html_to_text()
+                with instrumentation.timer(name="convert_html_to_text"):
+                    self.convert_html_to_text()
             if self.text:
                 print(
                     f"Extracting document {self.external_id} with "
                     f"{self.count_words} words which equals "
                     f"{self.equivalent_pages} A4 pages"
                 )
-                # Load the Swedish language model
-                self.nlp = spacy.load("sv_core_news_lg")
-                # The senter is 10x faster than the parser and we don't need dependency parsing
-                # See https://spacy.io/models/
-                self.nlp.disable_pipe("parser")
-                self.nlp.enable_pipe("senter")
-                self.chunk_text()
+                if self.sink is None:
+                    # Offline shards are published as a whole
+                    self.load_checkpoint()
+                with instrumentation.timer(name="chunk_text"):
+                    self.chunk_text()
                 # self.print_number_of_chunks()
-                self.iterate_chunks()
+                if self.sink is None and config.batched_ingest:
+                    self.batch = BatchInsert()
         else:
             logger.info(f"Skipping already processed document {self.external_id}")
 
+    def finish_extraction(self):
+        instrumentation.count(name="documents")
+        instrumentation.count(
+            name="accepted_tokens", number=self.number_of_accepted_tokens
+        )
+        if self.chunk_ends:
+            print(
+                f"Found {self.number_of_accepted_sentences} "
+                f"accepted sentences with a total of "
+                f"{self.number_of_accepted_tokens} accepted tokens"
+            )
+        if self.batch is not None:
+            # This flushes and commits the remaining rows
+            self.batch.close_db()
+            self.batch = None
+
     # def print_number_of_sentences(self):
     #     logger.info(f"Extracted {len(self.accepted_sentences)} sentences")
 
@@ -169,41 +187,82 @@ class Document(BaseModel):
         cleaned_chunk = "\n".join(cleaned_lines)
         return cleaned_chunk
 
-    def iterate_chunks(self):
-        count = 1
-        for chunk in self.chunks:
-            chunk = self.clean_toc(chunk=chunk)
-            # print(chunk[:10000])
-            # exit()
-            print(f"Iterating chunk {count}/" f"{self.number_of_chunks}")
-            doc = self.nlp(chunk)
-            self.iterate_sentences(doc=doc)
-            count += 1
+    @property
+    def number_of_remaining_chunks(self) -> int:
+        return self.number_of_chunks - self.processed_chunks
+
+    def cleaned_chunks(self) -> Iterator[str]:
+        """The chunks that are not yet processed"""
+        for chunk in iterate_chunks(
+            text=self.text, chunk_ends=self.chunk_ends, first=self.processed_chunks
+        ):
+            yield self.clean_toc(chunk=chunk)
+
+    def load_checkpoint(self):
+        read = Read()
+        read.connect_and_setup()
+        self.processed_offset = read.get_processed_offset(document=self)
+        read.close_db()
+        if self.processed_offset > self.text_length:
+            logger.warning(
+                f"Checkpoint {self.processed_offset} of document {self.external_id} "
+                f"is beyond its {self.text_length} characters, starting over"
+            )
+            self.processed_offset = 0
+        if self.processed_offset:
+            print(
+                f"Resuming document {self.external_id} after character "
+                f"{self.processed_offset}/{self.text_length}"
+            )
+
+    def analyze_chunk(self, doc: Doc):
+        instrumentation.count(name="chunks")
         print(
-            f"Found {self.number_of_accepted_sentences} "
-            f"accepted sentences with a total of "
-            f"{self.number_of_accepted_tokens} accepted tokens"
+            f"Iterating chunk {self.processed_chunks + 1}/" f"{self.number_of_chunks}"
         )
+        self.iterate_sentences(doc=doc)
+        self.checkpoint_chunk()
+
+    def checkpoint_chunk(self):
+        """Store that this chunk is done so a restart can resume
+        after it instead of starting the whole document over"""
+        if self.batch is not None:
+            self.batch.flush()
+        self.processed_chunks += 1
+        self.processed_offset = self.chunk_ends[self.processed_chunks - 1]
+        if self.sink is not None:
+            # A FileSink shard is published as a whole
+            return
+        update = Update()
+        update.connect_and_setup()
+        update.update_document_processed_offset(document=self)
+        update.close_db()
 
     def iterate_sentences(self, doc: Doc):
         sentence_count = 0
         for _ in doc.sents:
             sentence_count += 1
         print(f"Iterating {sentence_count} sentences in this chunk")
+        instrumentation.count(name="sentences", number=sentence_count)
+        sentences = [Sentence(doc=doc, sent=sent, document=self) for sent in doc.sents]
+        # One fasttext call for the whole chunk
+        language_detector.detect_sentences(
+            sentences=[
+                sentence for sentence in sentences if sentence.needs_language_detection
+            ]
+        )
         count = 1
-        for sent in doc.sents:
+        for sentence in sentences:
             if count % 100 == 0 or count == 1:
                 print(f"Iterating sentence {count}/{sentence_count}")
-            sentence = Sentence(doc=doc, sent=sent, document=self)
-            sentence.analyze_and_insert()
+            with instrumentation.timer(name="analyze_sentence"):
+                sentence.analyze_and_insert()
             self.accepted_sentences.append(sentence)
             count += 1
 
-    def insert_extract_and_update(self):
+    def insert_if_missing(self):
         if not self.id:
             self.insert_document()
-        self.extract_sentences()
-        self.update_document()
 
     def insert_document(self):
         insert = Insert()
@@ -0,0 +1,64 @@
+import codecs
+import logging
+import os
+from typing import Dict, Iterator, Optional, Set
+
+import ijson
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentSource(BaseModel):
+    """Streams Riksdagen dokumentstatus JSON files from a workdirectory
+
+    File paths are yielded as os.scandir finds them, so the first
+    document starts right away and we never hold a listing of the
+    flat Riksdagen directories. The order is the order of the file
+    system, shards are chosen by file name and a restart skips
+    processed documents by dok_id so nothing depends on it.
+    Each file is parsed incrementally and only the fields we need are
+    kept, the rest of the JSON (attachments, metadata) is never built."""
+
+    workdirectory: str
+    fields: tuple = ("dok_id", "text", "html")
+    prefix: str = "dokumentstatus.dokument"
+    # Documents we already processed, we stop parsing when we see these
+    skip_external_ids: Set[str] = set()
+
+    def iterate_file_paths(self) -> Iterator[str]:
+        if not self.workdirectory:
+            raise ValueError("workdirectory was empty string")
+        yield from self.__scan(directory=self.workdirectory)
+
+    def __scan(self, directory: str) -> Iterator[str]:
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self.__scan(directory=entry.path)
+                elif entry.name.endswith(".json"):
+                    yield entry.path
+
+    def read_fields(self, file_path: str) -> Optional[Dict[str, str]]:
+        """Return the wanted fields of the dokument object or
+        None if the file has no dokumentstatus.dokument object
+
+        We stop parsing as soon as all wanted fields have been seen
+        or when dok_id is one we should skip."""
+        found: Dict[str, str] = dict()
+        seen_dokument = False
+        with open(file_path, "rb") as json_file:
+            # Riksdagen files start with a byte order mark
+            if json_file.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+                json_file.seek(0)
+            for key, value in ijson.kvitems(json_file, self.prefix):
+                seen_dokument = True
+                if key in self.fields:
+                    found[key] = value
+                    if len(found) == len(self.fields):
+                        break
+                    if key == "dok_id" and value in self.skip_external_ids:
+                        break
+        if not seen_dokument:
+            return None
+        return found
@@ -1,18 +1,19 @@
 import logging
 from typing import Any, Set
 
-from pydantic import BaseModel
-
 from models.crud.insert import Insert
 from models.entity import Entity
 
 logger = logging.getLogger(__name__)
 
 
-class Entities(BaseModel):
-    sentence_id: int
-    entities: Set[Entity] = set()
-    sentence: Any
+class Entities:
+    __slots__ = ("sentence_id", "entities", "sentence")
+
+    def __init__(self, sentence_id: int, sentence: Any):
+        self.sentence_id = sentence_id
+        self.sentence = sentence
+        self.entities: Set[Entity] = set()
 
     def extract_and_insert(self):
         self.__extract()
@@ -1,15 +1,17 @@
-from pydantic import BaseModel
-
 from models.crud.insert import Insert
+from models.crud.lookup_tables import lookup_tables
 from models.crud.read import Read
 from models.exceptions import MissingInformationError
 
 
-class Entity(BaseModel):
+class Entity:
     """Hashable entity that can be deduplicated"""
 
-    label: str
-    ner_label: str
+    __slots__ = ("label", "ner_label")
+
+    def __init__(self, label: str, ner_label: str):
+        self.label = label
+        self.ner_label = ner_label
 
     def __hash__(self):
         return hash((self.label, self.ner_label))
@@ -19,6 +21,9 @@ class Entity(BaseModel):
 
     @property
     def ner_label_id(self) -> int:
+        ner_label_id = lookup_tables.ner_labels.get(self.ner_label)
+        if ner_label_id is not None:
+            return ner_label_id
         read = Read()
         read.connect_and_setup()
         data = read.get_ner_label_id(entity=self)
@@ -0,0 +1,159 @@
+import logging
+import os
+from typing import Any, Dict, Set, Tuple
+
+from pydantic import BaseModel
+
+import config
+from models.tsv import format_row
+from models.vocabulary import Vocabulary
+
+logger = logging.getLogger(__name__)
+
+# The files of a shard and their columns, see OfflineLoader for how
+# the natural keys and vocabulary ids are turned into database ids
+FILES = {
+    "documents": ("external_id",),
+    "sentences": (
+        "document",
+        "uuid",
+        "text",
+        "text_hash",
+        "language",
+        "score",
+    ),
+    # These two are the vocabularies of the shard, see Vocabulary
+    "rawtokens": ("id", "text", "lexical_category", "language", "score"),
+    "normtokens": ("id", "text"),
+    "rawtoken_normtoken": ("rawtoken", "normtoken"),
+    "sentence_rawtoken": ("uuid", "rawtoken"),
+    "entities": ("label", "ner_label"),
+    "sentence_entity": ("uuid", "label", "ner_label"),
+}
+COMPLETE_MARKER = "COMPLETE"
+LOADED_MARKER = "LOADED"
+
+
+def shard_directory(dataset_id: int, shard: int, workers: int) -> str:
+    return os.path.join(
+        config.offline_directory,
+        f"dataset_{dataset_id}",
+        f"shard_{shard}_of_{workers}",
+    )
+
+
+class FileSink(BaseModel):
+    """Writes what we extract from one dataset shard to TSV files
+
+    This is the offline alternative to writing to MariaDB. Nothing here
+    needs a database id. Tokens get ids from a Vocabulary of the shard,
+    other rows refer to each other by natural keys (document external id,
+    sentence uuid, postag, language iso code, score value and NER label).
+    OfflineLoader resolves them when it bulk imports the files.
+
+    Rows are written to .part files which are renamed when the shard
+    is done, followed by a COMPLETE marker. A shard that was interrupted
+    is simply extracted again."""
+
+    directory: str
+    files: Dict[str, Any] = dict()
+    rawtokens: Vocabulary = Vocabulary()
+    normtokens: Vocabulary = Vocabulary()
+    # Rows that many sentences share are only written once per shard
+    seen_rawtoken_normtoken: Set[Tuple[int, int]] = set()
+    seen_entities: Set[Tuple[str, str]] = set()
+    rows: int = 0
+
+    @property
+    def is_complete(self) -> bool:
+        return os.path.isfile(os.path.join(self.directory, COMPLETE_MARKER))
+
+    @property
+    def is_loaded(self) -> bool:
+        return os.path.isfile(os.path.join(self.directory, LOADED_MARKER))
+
+    def open(self) -> None:
+        """Start the shard over, a loaded shard is extracted again
+        to pick up documents that were added since"""
+        os.makedirs(self.directory, exist_ok=True)
+        for marker in (COMPLETE_MARKER, LOADED_MARKER):
+            if os.path.isfile(os.path.join(self.directory, marker)):
+                os.remove(os.path.join(self.directory, marker))
+        for name in FILES:
+            self.files[name] = open(
+                self.part_path(name=name), "w", encoding="utf-8", newline="\n"
+            )
+
+    def part_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.tsv.part")
+
+    def write(self, name: str, *values: Any) -> None:
+        self.files[name].write(format_row(values))
+        self.rows += 1
+
+    def add_document(self, document: Any) -> None:
+        """Called when all chunks of the document are written"""
+        self.write("documents", document.external_id)
+
+    @staticmethod
+    def rawtoken_key(token: Any) -> Tuple[str, str, str]:
+        return token.rawtoken, token.pos, token.sentence.detected_language
+
+    def add_token(self, token: Any) -> None:
+        key = self.rawtoken_key(token=token)
+        # The first occurrence decides the score like in the database
+        rawtoken_id, new = self.rawtokens.id_of(
+            key=key, attributes=(str(token.sentence.score),)
+        )
+        if new:
+            self.files["rawtokens"].write(self.rawtokens.row(id_=rawtoken_id, key=key))
+            self.rows += 1
+        normtoken_id, new = self.normtokens.id_of(key=(token.normalized_token,))
+        if new:
+            self.write("normtokens", normtoken_id, token.normalized_token)
+        link = (rawtoken_id, normtoken_id)
+        if link not in self.seen_rawtoken_normtoken:
+            self.seen_rawtoken_normtoken.add(link)
+            self.write("rawtoken_normtoken", *link)
+
+    def add_sentence(self, sentence: Any) -> None:
+        """Write the sentence, its token links and its entities"""
+        self.write(
+            "sentences",
+            sentence.document.external_id,
+            sentence.uuid,
+            sentence.text,
+            sentence.text_hash.hex(),
+            sentence.detected_language,
+            sentence.score,
+        )
+        # add_token already gave every accepted token an id
+        rawtoken_ids = {
+            self.rawtokens.ids[self.rawtoken_key(token=token)]
+            for token in sentence.accepted_tokens
+        }
+        for rawtoken_id in sorted(rawtoken_ids):
+            self.write("sentence_rawtoken", sentence.uuid, rawtoken_id)
+        entities = {
+            (ent.text, ent.label_)
+            for ent in sentence.doc.ents
+            if ent.start >= sentence.sent.start and ent.end <= sentence.sent.end
+        }
+        for entity in sorted(entities):
+            if entity not in self.seen_entities:
+                self.seen_entities.add(entity)
+                self.write("entities", *entity)
+            self.write("sentence_entity", sentence.uuid, *entity)
+
+    def close(self) -> None:
+        """Publish the files of this shard"""
+        for name, file in self.files.items():
+            file.close()
+            os.replace(
+                self.part_path(name=name),
+                os.path.join(self.directory, f"{name}.tsv"),
+            )
+        self.files = dict()
+        with open(os.path.join(self.directory, COMPLETE_MARKER), "w") as marker:
+            marker.write(f"{self.rows}\n")
+        print(f"Wrote {self.rows} rows to {self.directory}")
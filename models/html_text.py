@@ -0,0 +1,85 @@
+import logging
+from typing import Any, Iterator, Tuple
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Elements whose text we never want as sentences
+SKIPPED_TAGS = frozenset({"script", "style", "template", "table"})
+
+
+def iterate_events(html: str, feed_size: int) -> Iterator[Tuple[str, Any]]:
+    """Feed the HTML to the lxml pull parser in parts and yield its events"""
+    parser = etree.HTMLPullParser(
+        events=("start", "end"), remove_comments=True, remove_pis=True, huge_tree=True
+    )
+    for start in range(0, len(html), feed_size):
+        parser.feed(html[start : start + feed_size])
+        yield from parser.read_events()
+    try:
+        parser.close()
+    except etree.XMLSyntaxError as e:
+        # E.g. a document with nothing but comments
+        logger.debug(f"Could not parse html: {e}")
+    yield from parser.read_events()
+
+
+def iterate_html_text(html: str, feed_size: int = 65536) -> Iterator[str]:
+    """Yield the text of an HTML document in document order
+
+    Every element is cleared as soon as its text has been yielded, so
+    we never hold more than the current path of the tree. The text of
+    an element is complete when its first child starts or when it ends,
+    the tail of an element when its next sibling starts or when its
+    parent ends."""
+    if not html.strip():
+        return
+    skipped_depth = 0
+    for event, element in iterate_events(html=html, feed_size=feed_size):
+        if event == "start":
+            if not skipped_depth:
+                previous = element.getprevious()
+                if previous is not None:
+                    text = previous.tail
+                else:
+                    parent = element.getparent()
+                    text = parent.text if parent is not None else None
+                if text:
+                    yield text
+            if element.tag in SKIPPED_TAGS:
+                skipped_depth += 1
+        else:
+            if not skipped_depth:
+                last_child = element[-1] if len(element) else None
+                text = element.text if last_child is None else last_child.tail
+                if text:
+                    yield text
+            if element.tag in SKIPPED_TAGS:
+                skipped_depth -= 1
+            # Everything inside and before this element has been yielded
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+def html_to_text(html: str) -> str:
+    """Text of the HTML with the parser chosen in config.html_converter
+
+    Text pieces are joined by a space like BeautifulSoup get_text with
+    separator=" " did. The lxml converter also leaves out tables."""
+    if config.html_converter == "lxml":
+        return " ".join(iterate_html_text(html=html))
+    if config.html_converter == "beautifulsoup":
+        return beautifulsoup_html_to_text(html=html)
+    raise ValueError(f"unknown html converter '{config.html_converter}'")
+
+
+def beautifulsoup_html_to_text(html: str) -> str:
+    """The original converter, builds the whole BeautifulSoup tree"""
+    soup = BeautifulSoup(html, "lxml")
+    # TODO investigate how stripping affects the result
+    return soup.get_text(separator=" ", strip=False)
@@ -0,0 +1,307 @@
+import functools
+import heapq
+import inspect
+import json
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_PREFIX = "riksdagen"
+# Timers of single SQL statements are named by this and the normalized
+# statement, see TimedCursor
+STATEMENT_PREFIX = "SQL: "
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics(BaseModel):
+    """Timers and counters of one scope: the whole run, a dataset or a document
+
+    A timer holds [calls, seconds, self seconds]. Self seconds exclude the
+    time spent in timers nested inside it, so they add up to the wall time."""
+
+    timers: Dict[str, List[float]] = dict()
+    counters: Dict[str, int] = dict()
+
+    @property
+    def seconds(self) -> float:
+        return sum(timer[2] for timer in self.timers.values())
+
+    def add_time(self, name: str, seconds: float, self_seconds: float) -> None:
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, self_seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] += self_seconds
+
+    def add_count(self, name: str, number: int) -> None:
+        self.counters[name] = self.counters.get(name, 0) + number
+
+    def merge(self, data: Dict[str, Any]) -> None:
+        """Add what to_dict() of another Metrics returned"""
+        for name, timer in data["timers"].items():
+            own = self.timers.setdefault(name, [0, 0.0, 0.0])
+            own[0] += timer["calls"]
+            own[1] += timer["seconds"]
+            own[2] += timer["self_seconds"]
+        for name, number in data["counters"].items():
+            self.add_count(name=name, number=number)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "timers": {
+                name: {
+                    "calls": int(calls),
+                    "seconds": round(seconds, 6),
+                    "self_seconds": round(self_seconds, 6),
+                }
+                for name, (calls, seconds, self_seconds) in sorted(self.timers.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+class Instrumentation(BaseModel):
+    """Timers and counters for the stages of the ingest pipeline
+
+    Everything is recorded for the whole run, for the current dataset
+    and, when a document scope is active, for the current document.
+    Documents are interleaved in nlp.pipe so the Dataset enters the scope
+    of a document explicitly while it works on it. Only the slowest
+    documents are kept, the rest are folded into their dataset."""
+
+    enabled: bool = config.instrumentation
+    max_documents: int = config.instrumentation_slowest_documents
+    total: Metrics = Metrics()
+    datasets: Dict[int, Metrics] = dict()
+    dataset: Optional[Metrics] = None
+    document: Optional[Metrics] = None
+    # Min-heap of (seconds, external id, metrics) of the slowest documents
+    slowest_documents: List[Tuple[float, str, Dict[str, Any]]] = list()
+    # Time spent in nested timers, one entry per running timer
+    children: List[float] = list()
+
+    def start_dataset(self, dataset_id: int) -> None:
+        self.dataset = self.datasets.setdefault(dataset_id, Metrics())
+
+    @contextmanager
+    def document_scope(self, metrics: Metrics) -> Iterator[None]:
+        previous, self.document = self.document, metrics
+        try:
+            yield
+        finally:
+            self.document = previous
+
+    def finish_document(self, external_id: str, metrics: Metrics) -> None:
+        entry = (metrics.seconds, external_id, metrics.to_dict())
+        if len(self.slowest_documents) < self.max_documents:
+            heapq.heappush(self.slowest_documents, entry)
+        elif entry[0] > self.slowest_documents[0][0]:
+            heapq.heapreplace(self.slowest_documents, entry)
+
+    def scopes(self) -> Iterator[Metrics]:
+        yield self.total
+        if self.dataset is not None:
+            yield self.dataset
+        if self.document is not None:
+            yield self.document
+
+    def start(self) -> float:
+        self.children.append(0.0)
+        return perf_counter()
+
+    def stop(self, name: str, start: float) -> float:
+        """Record the timer and return its seconds"""
+        seconds = perf_counter() - start
+        self_seconds = seconds - self.children.pop()
+        if self.children:
+            self.children[-1] += seconds
+        for metrics in self.scopes():
+            metrics.add_time(name=name, seconds=seconds, self_seconds=self_seconds)
+        return seconds
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = self.start()
+        try:
+            yield
+        finally:
+            self.stop(name=name, start=start)
+
+    def count(self, name: str, number: int = 1) -> None:
+        if self.enabled:
+            for metrics in self.scopes():
+                metrics.add_count(name=name, number=number)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Time every step of an iterator, e.g. the batches of nlp.pipe"""
+        iterator = iter(iterable)
+        while True:
+            with self.timer(name=name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def snapshot(self, dataset_id: int) -> Dict[str, Any]:
+        """What a worker process sends back to be merged"""
+        return {
+            "dataset": self.datasets.get(dataset_id, Metrics()).to_dict(),
+            "slowest_documents": self.slowest_documents,
+        }
+
+    def merge(self, dataset_id: int, snapshot: Dict[str, Any]) -> None:
+        """Add the metrics of a worker, their seconds are summed over processes"""
+        self.total.merge(data=snapshot["dataset"])
+        self.datasets.setdefault(dataset_id, Metrics()).merge(data=snapshot["dataset"])
+        for seconds, external_id, metrics in snapshot["slowest_documents"]:
+            self.finish_document(
+                external_id=external_id, metrics=Metrics(**self.unpack(metrics))
+            )
+
+    @staticmethod
+    def unpack(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "timers": {
+                name: [timer["calls"], timer["seconds"], timer["self_seconds"]]
+                for name, timer in data["timers"].items()
+            },
+            "counters": data["counters"],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.to_dict(),
+            "datasets": {
+                str(dataset_id): metrics.to_dict()
+                for dataset_id, metrics in sorted(self.datasets.items())
+            },
+            "slowest_documents": [
+                {"external_id": external_id, "seconds": round(seconds, 6), **metrics}
+                for seconds, external_id, metrics in sorted(
+                    self.slowest_documents, reverse=True
+                )
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        """The Prometheus text exposition format, the whole run has dataset="all" """
+        scopes = [("all", self.total)] + [
+            (str(dataset_id), metrics)
+            for dataset_id, metrics in sorted(self.datasets.items())
+        ]
+        lines = list()
+        for metric, index, help_text in (
+            ("stage_calls_total", 0, "Number of times the stage ran"),
+            ("stage_seconds_total", 1, "Seconds spent in the stage"),
+            (
+                "stage_self_seconds_total",
+                2,
+                "Seconds spent in the stage excluding nested stages",
+            ),
+        ):
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} counter")
+            for dataset, metrics in scopes:
+                for name, timer in sorted(metrics.timers.items()):
+                    lines.append(
+                        f'{PROMETHEUS_PREFIX}_{metric}{{dataset="{dataset}",'
+                        f'stage="{escape_label(name)}"}} {timer[index]}'
+                    )
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_events_total Counted events")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_events_total counter")
+        for dataset, metrics in scopes:
+            for name, number in sorted(metrics.counters.items()):
+                lines.append(
+                    f'{PROMETHEUS_PREFIX}_events_total{{dataset="{dataset}",'
+                    f'name="{escape_label(name)}"}} {number}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Write JSON, or the Prometheus text format if the path ends in .prom"""
+        with open(path, "w") as file:
+            if path.endswith(".prom"):
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), file, indent=2)
+                file.write("\n")
+        print(f"Wrote timings and counters to {path}")
+
+    def print_statistics(self, number_of_stages: int = 15):
+        if not self.total.timers:
+            return
+        stages = list()
+        statements = list()
+        for name, timer in self.total.timers.items():
+            if name.startswith(STATEMENT_PREFIX):
+                statements.append((name[len(STATEMENT_PREFIX) :], timer))
+            else:
+                stages.append((name, timer))
+        print("Time per stage (self seconds exclude nested stages and SQL):")
+        for name, (calls, seconds, self_seconds) in sorted(
+            stages, key=lambda item: item[1][2], reverse=True
+        )[:number_of_stages]:
+            print(
+                f"  {name}: {int(calls)} calls, {seconds:.2f}s, "
+                f"{self_seconds:.2f}s self"
+            )
+        for name, number in sorted(self.total.counters.items()):
+            print(f"  {name}: {number}")
+        if statements:
+            print(f"Time per SQL statement ({len(statements)} distinct):")
+            for statement, (calls, seconds, _) in sorted(
+                statements, key=lambda item: item[1][1], reverse=True
+            )[:number_of_stages]:
+                print(
+                    f"  {int(calls)} calls, {seconds:.2f}s, "
+                    f"{seconds / calls * 1000:.2f}ms mean: {statement[:200]}"
+                )
+
+
+instrumentation = Instrumentation()
+
+
+def timed(name: str, function: Callable) -> Callable:
+    """The timer without the overhead of a context manager,
+    CRUD methods are called for every sentence and token"""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled:
+            return function(*args, **kwargs)
+        start = instrumentation.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            instrumentation.stop(name=name, start=start)
+
+    return wrapper
+
+
+def instrumented(cls):
+    """Class decorator that times every public method defined on the class
+
+    We use it on the CRUD classes, each method is named Class.method.
+    Static methods have no cursor so we leave these helpers alone."""
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith(("_", "model_")):
+            continue
+        if inspect.isfunction(attribute):
+            setattr(cls, name, timed(f"{cls.__name__}.{name}", attribute))
+    return cls
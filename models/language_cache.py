@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+import config
+from models.crud.lru_cache import LruCache
+
+logger = logging.getLogger(__name__)
+
+
+class LanguageCache(BaseModel):
+    """Persistent cache of language detection results
+
+    Riksdagen documents repeat headings and standard formulas thousands
+    of times so we remember (language, score) per hash of the cleaned
+    sentence in a SQLite file that survives between runs. An LruCache
+    in front of it answers the most common sentences from memory.
+    When the file grows above max_entries the oldest rows are removed."""
+
+    path: str = config.language_cache_path
+    max_entries: int = config.language_cache_size
+    memory: Optional[LruCache] = None
+    connection: Any = None
+    hits: int = 0
+    misses: int = 0
+
+    def model_post_init(self, __context: Any) -> None:
+        self.memory = LruCache(
+            name="language", max_entries=config.language_cache_memory_size
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def key(cleaned_sentence: str) -> bytes:
+        return hashlib.blake2b(
+            cleaned_sentence.encode("utf-8"), digest_size=16
+        ).digest()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            # Worker processes share the file, WAL lets them read while one writes
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS language (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    hash BLOB NOT NULL UNIQUE,
+                    language TEXT NOT NULL,
+                    score REAL NOT NULL
+                )
+                """
+            )
+            self.connection.commit()
+        return self.connection
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, Tuple[str, float]]:
+        """Return the cached results we have for the keys"""
+        found: Dict[bytes, Tuple[str, float]] = dict()
+        missing = list()
+        for key in keys:
+            result = self.memory.get(key)
+            if result is None:
+                missing.append(key)
+            else:
+                found[key] = result
+        if missing:
+            connection = self.connect()
+            # Stay below the default limit of SQLite host parameters
+            for start in range(0, len(missing), 500):
+                part = missing[start : start + 500]
+                rows = connection.execute(
+                    "SELECT hash, language, score FROM language "
+                    f"WHERE hash IN ({', '.join('?' * len(part))})",
+                    part,
+                )
+                for key, language, score in rows:
+                    found[key] = (language, score)
+                    self.memory.put(key, (language, score))
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, results: Dict[bytes, Tuple[str, float]]) -> None:
+        if not results:
+            return
+        for key, result in results.items():
+            self.memory.put(key, result)
+        connection = self.connect()
+        connection.executemany(
+            "INSERT OR IGNORE INTO language (hash, language, score) VALUES (?, ?, ?)",
+            [(key, language, score) for key, (language, score) in results.items()],
+        )
+        connection.commit()
+
+    def prune(self) -> None:
+        """Keep the newest max_entries rows"""
+        connection = self.connect()
+        connection.execute(
+            "DELETE FROM language WHERE id <= " "(SELECT MAX(id) FROM language) - ?",
+            (self.max_entries,),
+        )
+        connection.commit()
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.prune()
+            self.connection.close()
+            self.connection = None
+
+    def print_statistics(self):
+        print(
+            f"Language detection cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.1%} hit rate)"
+        )
+
+
+language_cache = LanguageCache()
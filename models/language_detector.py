@@ -0,0 +1,114 @@
+import contextlib
+import io
+import logging
+import os
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+import fasttext
+from ftlangdetect.detect import get_or_load_model
+from pydantic import BaseModel
+
+import config
+from models.instrumentation import instrumentation
+from models.language_cache import language_cache
+
+logger = logging.getLogger(__name__)
+
+
+class LanguageDetector(BaseModel):
+    """Detects the language of many sentences with one fasttext call
+
+    The model is loaded the first time it is needed and then kept for
+    the life of the process. config.fasttext_model is used if it is a
+    path to a model on disk, otherwise ftlangdetect downloads it."""
+
+    model: Any = None
+    cache: Any = None
+    sentences: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.cache is None:
+            self.cache = language_cache
+
+    def load_model(self) -> Any:
+        if self.model is None:
+            start = perf_counter()
+            if os.path.isfile(config.fasttext_model):
+                # fasttext prints a warning to stderr on every load
+                with contextlib.redirect_stderr(io.StringIO()):
+                    self.model = fasttext.load_model(config.fasttext_model)
+            else:
+                self.model = get_or_load_model(
+                    low_memory=config.fasttext_model.endswith(".ftz")
+                )
+            print(
+                f"Loaded fasttext model {config.fasttext_model} "
+                f"in {perf_counter() - start:.2f}s"
+            )
+        return self.model
+
+    def detect(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """Return (language code, score) for every text
+
+        The texts must not contain newlines, cleaned sentences never do"""
+        if not texts:
+            return list()
+        model = self.load_model()
+        start = perf_counter()
+        with instrumentation.timer(name="detect_language"):
+            labels, probabilities = model.predict(texts, k=1)
+        self.seconds += perf_counter() - start
+        self.sentences += len(texts)
+        self.batches += 1
+        return [
+            (label[0].replace("__label__", ""), min(float(probability[0]), 1.0))
+            for label, probability in zip(labels, probabilities)
+        ]
+
+    def detect_sentences(self, sentences: List[Any]) -> None:
+        """Assign detected_language and score to the sentences in one batch
+
+        Sentences already in the language cache are not sent to fasttext"""
+        if not self.cache.enabled:
+            results = self.detect(
+                texts=[sentence.cleaned_sentence for sentence in sentences]
+            )
+            for sentence, (language, score) in zip(sentences, results):
+                self.assign(sentence=sentence, language=language, score=score)
+            return
+        texts: Dict[bytes, str] = dict()
+        keys = list()
+        for sentence in sentences:
+            key = self.cache.key(sentence.cleaned_sentence)
+            keys.append(key)
+            texts.setdefault(key, sentence.cleaned_sentence)
+        results = self.cache.get_many(keys=list(texts))
+        missing = [key for key in texts if key not in results]
+        detected = dict(
+            zip(missing, self.detect(texts=[texts[key] for key in missing]))
+        )
+        self.cache.put_many(results=detected)
+        results.update(detected)
+        for sentence, key in zip(sentences, keys):
+            language, score = results[key]
+            self.assign(sentence=sentence, language=language, score=score)
+
+    @staticmethod
+    def assign(sentence: Any, language: str, score: float) -> None:
+        # We round the score because the extra decimals do not add anything of value
+        sentence.score = round(score, 2)
+        sentence.detected_language = language
+
+    def print_statistics(self):
+        if self.seconds:
+            print(
+                f"Language detection: {self.sentences} sentences in "
+                f"{self.batches} batches, {self.seconds:.2f}s "
+                f"({self.sentences / self.seconds:.0f} sentences/s)"
+            )
+
+
+language_detector = LanguageDetector()
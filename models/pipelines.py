@@ -0,0 +1,72 @@
+import logging
+from time import perf_counter
+from typing import Any, Dict, Tuple
+
+import spacy
+from pydantic import BaseModel
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PipelineKey = Tuple[str, Tuple[str, ...], Tuple[str, ...]]
+
+
+class Pipelines(BaseModel):
+    """Registry of lazily loaded spaCy pipelines
+
+    Loading sv_core_news_lg takes seconds and hundreds of MB,
+    so we load each pipeline once per process and hand the
+    same object to every document. Pipelines are keyed by model
+    name and the pipes that are enabled and disabled."""
+
+    pipelines: Dict[PipelineKey, Any] = dict()
+    load_counts: Dict[PipelineKey, int] = dict()
+    load_seconds: Dict[PipelineKey, float] = dict()
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def get(
+        self,
+        model: str = config.spacy_model,
+        enable: Tuple[str, ...] = ("senter",),
+        disable: Tuple[str, ...] = ("parser",),
+    ) -> Any:
+        """Return the pipeline for this key and load it on first use
+
+        The defaults give us the senter which is 10x faster than
+        the parser and we don't need dependency parsing
+        See https://spacy.io/models/"""
+        key = (model, tuple(sorted(enable)), tuple(sorted(disable)))
+        if key not in self.pipelines:
+            self.pipelines[key] = self.__load(key=key)
+        return self.pipelines[key]
+
+    def __load(self, key: PipelineKey) -> Any:
+        model, enable, disable = key
+        logger.info(f"Loading spaCy pipeline {model}")
+        start = perf_counter()
+        nlp = spacy.load(model)
+        for pipe in disable:
+            nlp.disable_pipe(pipe)
+        for pipe in enable:
+            nlp.enable_pipe(pipe)
+        seconds = perf_counter() - start
+        self.load_counts[key] = self.load_counts.get(key, 0) + 1
+        self.load_seconds[key] = self.load_seconds.get(key, 0.0) + seconds
+        logger.info(f"Loaded spaCy pipeline {model} in {seconds:.2f}s")
+        return nlp
+
+    def print_load_report(self):
+        if not self.load_counts:
+            print("No spaCy pipelines were loaded")
+        for key, count in self.load_counts.items():
+            model, enable, disable = key
+            print(
+                f"spaCy pipeline {model} "
+                f"(enabled: {', '.join(enable) or '-'}, "
+                f"disabled: {', '.join(disable) or '-'}) "
+                f"was loaded {count} time(s) in this process "
+                f"taking {self.load_seconds[key]:.2f}s"
+            )
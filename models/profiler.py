@@ -0,0 +1,106 @@
+import cProfile
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler(BaseModel):
+    """Profiles the first documents of a run, see --profile
+
+    Two profiles are written when we stop. The cProfile stats go to path
+    and can be read with pstats or snakeviz. A thread samples the stack
+    of the profiled thread every sample_interval seconds and the samples
+    are written as collapsed stacks, the format of py-spy --format raw,
+    which flamegraph.pl and speedscope turn into a flame graph."""
+
+    path: str = ""
+    max_documents: int = 0  # zero means the whole run
+    sample_interval: float = config.profile_sample_interval
+    documents: int = 0
+    running: bool = False
+    profile: Any = None
+    samples: Counter = Counter()
+    thread_id: int = 0
+    sampler: Optional[threading.Thread] = None
+    stopped: Optional[threading.Event] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def collapsed_path(self) -> str:
+        return f"{os.path.splitext(self.path)[0]}.collapsed"
+
+    def start(self) -> None:
+        if not self.enabled or self.profile is not None:
+            # We profile once per process
+            return
+        if self.max_documents:
+            print(f"Profiling the first {self.max_documents} documents")
+        else:
+            print("Profiling the whole run")
+        self.running = True
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(
+            target=self.sample, name="profile-sampler", daemon=True
+        )
+        self.sampler.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def document_finished(self) -> None:
+        if not self.running:
+            return
+        self.documents += 1
+        if self.max_documents and self.documents >= self.max_documents:
+            self.stop()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self.profile.disable()
+        self.stopped.set()
+        self.sampler.join()
+        self.running = False
+        self.profile.dump_stats(self.path)
+        self.write_collapsed_stacks()
+        print(
+            f"Profiled {self.documents} documents, wrote cProfile stats to "
+            f"{self.path} and {sum(self.samples.values())} stack samples "
+            f"to {self.collapsed_path}"
+        )
+
+    def sample(self) -> None:
+        """Runs in its own thread until stop()"""
+        while not self.stopped.wait(self.sample_interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = list()
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write_collapsed_stacks(self) -> None:
+        with open(self.collapsed_path, "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+profiler = Profiler()
@@ -1,37 +1,86 @@
+import hashlib
 import logging
-import string
 import uuid
 from typing import Any, List
 
-from ftlangdetect import detect
-from pydantic import BaseModel
 from spacy.language import Doc
 from spacy.tokens import Span
 
 import config
+from models.cleaning import clean_sentence
 from models.crud.insert import Insert
+from models.crud.lookup_tables import lookup_tables
 from models.crud.read import Read
 from models.entities import Entities
+from models.language_detector import language_detector
 from models.token import Token
+from models.token_filter import token_filter
 
 logger = logging.getLogger(__name__)
 
 
-class Sentence(BaseModel):
-    sent: Span
-    doc: Doc
-    document: Any
-    accepted_tokens: List[Token] = list()
-    uuid: str = ""
-    score: float = 0.0
-    detected_language: str = ""
+def hash_text(text: str) -> bytes:
+    """SHA1 of the lowercase text without trailing spaces
 
-    class Config:
-        arbitrary_types_allowed = True
+    This approximates the old unique key over the text column. Its
+    utf8mb4_general_ci collation also ignored accents, which a hash
+    cannot, so "é" and "e" are now different sentences.
+
+    Create.migrate_sentence_text_hash computes the hash of existing rows
+    in SQL with TEXT_HASH_SQL. MariaDB LOWER() and str.lower() agree on
+    common letters like åäö, but str.lower() follows a newer Unicode
+    version and turns e.g. "İ" into two characters, so a sentence with
+    such letters can get a second row after the migration."""
+    return hashlib.sha1(text.rstrip(" ").lower().encode("utf-8")).digest()
+
+
+class Sentence:
+    """A sentence in a spaCy Doc
+
+    We create one of these for every sentence we ingest, so this is a
+    plain class with __slots__ instead of a pydantic model. The values
+    that are read many times are computed once and kept in a slot."""
+
+    __slots__ = (
+        "sent",
+        "doc",
+        "document",
+        "accepted_tokens",
+        "uuid",
+        "score",
+        "detected_language",
+        "_text",
+        "_text_hash",
+        "_cleaned_sentence",
+        "_number_of_words_in_clean_sentence",
+    )
+
+    def __init__(self, sent: Span, doc: Doc, document: Any):
+        self.sent = sent
+        self.doc = doc
+        self.document = document
+        self.accepted_tokens: List[Token] = list()
+        self.uuid = ""
+        self.score = 0.0
+        self.detected_language = ""
+        self._text = None
+        self._text_hash = None
+        self._cleaned_sentence = None
+        self._number_of_words_in_clean_sentence = None
 
     @property
     def text(self) -> str:
-        return str(self.sent.text)
+        if self._text is None:
+            self._text = str(self.sent.text)
+        return self._text
+
+    @property
+    def text_hash(self) -> bytes:
+        """See hash_text, the sentence table is unique on this
+        together with document and language"""
+        if self._text_hash is None:
+            self._text_hash = hash_text(self.text)
+        return self._text_hash
 
     @property
     def id(self) -> int:
@@ -45,6 +94,9 @@ class Sentence(BaseModel):
     @property
     def score_id(self) -> int:
         """ID of this score in the database"""
+        score_id = lookup_tables.get_score_id(score=self.score)
+        if score_id is not None:
+            return score_id
         read = Read()
         read.connect_and_setup()
         data = read.get_score(sentence=self)
@@ -54,6 +106,9 @@ class Sentence(BaseModel):
     @property
     def language_id(self) -> int:
         """ID of this language in the database"""
+        language_id = lookup_tables.languages.get(self.detected_language.lower())
+        if language_id is not None:
+            return language_id
         read = Read()
         read.connect_and_setup()
         data = read.get_language(sentence=self)
@@ -70,40 +125,36 @@ class Sentence(BaseModel):
 
     @property
     def cleaned_sentence(self) -> str:
-        # Remove newlines, digits and a selection of characters
-        sentence = self.text
-        sentence = (
-            sentence.replace("\t", " ")
-            .replace(":", "")
-            .replace("(", "")
-            .replace(")", "")
-            .replace("-", "")
-            .replace("–", "")
-            .replace("/", "")
-        )
-        sentence = "".join(char for char in sentence if char not in string.punctuation)
-        # Split the sentence into words and remove words containing numbers
-        words = [
-            word
-            for word in sentence.split()
-            if not any(char.isdigit() for char in word)
-        ]
-        sentence = " ".join(words)
+        """Remove newlines, digits and a selection of characters
+
+        This is read many times per sentence so we compute it once"""
         # common_one_word_sentences = ['metod', 'slutsats', 'tabell',
         #                              'problem', 'problemformulering', 'bilaga']
         # for word in common_one_word_sentences:
         #     if sentence.lower() == word:
         #         sentence = ""
-        return sentence
+        if self._cleaned_sentence is None:
+            self._cleaned_sentence = clean_sentence(self.text)
+        return self._cleaned_sentence
 
     @property
     def number_of_words_in_clean_sentence(self) -> int:
-        return len(self.cleaned_sentence.split())
+        if self._number_of_words_in_clean_sentence is None:
+            self._number_of_words_in_clean_sentence = len(self.cleaned_sentence.split())
+        return self._number_of_words_in_clean_sentence
 
     @property
     def has_content_after_cleaning(self) -> bool:
         return bool(self.cleaned_sentence)
 
+    @property
+    def needs_language_detection(self) -> bool:
+        """Sentences that analyze_and_insert will detect the language of"""
+        return (
+            self.has_content_after_cleaning
+            and self.number_of_words_in_clean_sentence != 1
+        )
+
     @property
     def has_acceptable_score(self) -> bool:
         return self.score >= 0.4
@@ -125,8 +176,11 @@ class Sentence(BaseModel):
                 )
             else:
                 # Found more than one word
-                self.detect_language()
-                self.insert_score()
+                # Document.iterate_sentences usually detected it already
+                if not self.detected_language:
+                    self.detect_language()
+                if self.document.sink is None:
+                    self.insert_score()
                 self.iterate_tokens()
                 # We don't trust scores below this threshold
                 # They are often occur when only one or two tokens
@@ -138,6 +192,11 @@ class Sentence(BaseModel):
                     and self.detected_language in config.accepted_languages
                     and self.has_acceptable_score
                 ):
+                    if self.document.sink is not None:
+                        # The loader skips sentences we already have
+                        self.generate_uuid()
+                        self.document.sink.add_sentence(sentence=self)
+                        return
                     sentence_id = self.id
                     if not sentence_id:
                         # self.print_ner_result()
@@ -159,6 +218,8 @@ class Sentence(BaseModel):
                     )
 
     def insert_score(self):
+        if lookup_tables.get_score_id(score=self.score) is not None:
+            return
         read = Read()
         read.connect_and_setup()
         score = read.get_score(sentence=self)
@@ -170,15 +231,22 @@ class Sentence(BaseModel):
             insert.close_db()
 
     def iterate_tokens(self):
-        for token_ in self.sent:
-            token = Token(token=token_, sentence=self)
-            token.analyze_and_insert()
-            if token.is_accepted_token:
-                self.accepted_tokens.append(token)
-            else:
-                logger.debug(
-                    f"Discarded token: '{token.rawtoken}@{self.detected_language}'"
-                )
+        """Only accepted tokens become Token objects, the rest
+        are discarded by TokenFilter without leaving spaCy"""
+        accepted_indices = token_filter.accepted_indices(
+            span=self.sent, language=self.detected_language
+        )
+        for index in accepted_indices:
+            token = Token(token=self.sent[int(index)], sentence=self)
+            token.insert()
+            self.accepted_tokens.append(token)
+        if logger.isEnabledFor(logging.DEBUG):
+            accepted = set(accepted_indices.tolist())
+            for index, token_ in enumerate(self.sent):
+                if index not in accepted:
+                    logger.debug(
+                        f"Discarded token: '{token_.text}@{self.detected_language}'"
+                    )
 
     # def clean_and_print_sentence(self):
     #     logger.info(
@@ -191,20 +259,14 @@ class Sentence(BaseModel):
         self.uuid = str(uuid.uuid4())
 
     def detect_language(self) -> None:
-        """Detect language using fasttext"""
-        # This returns a dict like so: {'lang': 'tr', 'score': 0.9982126951217651}
+        """Detect language using fasttext
+
+        Document.iterate_sentences detects all sentences of a chunk
+        in one batch, this is for a single sentence"""
         # We clean the sentence before language detection to avoid garbage results
-        cleaned_sentence = self.cleaned_sentence
         # TODO implement swedish lexeme based detection if < 4 words
-        if cleaned_sentence:
-            result = detect(text=cleaned_sentence, low_memory=False)
-            # if result["score"] < 0.4:
-            #     # This can be caused by the cleaning,
-            #     # so try alternative cleaning where newlines
-            #     # are replaced with spaces
-            # We round the score because the extra decimals do not add anything of value
-            self.score = round(result["score"], 2)
-            self.detected_language = result["lang"]
+        if self.cleaned_sentence:
+            language_detector.detect_sentences(sentences=[self])
         else:
             logger.warning(f"No content after cleaning, skipping language detection")
 
@@ -223,7 +285,11 @@ class Sentence(BaseModel):
         insert = Insert()
         insert.connect_and_setup()
         sentence_id = insert.insert_sentence(sentence=self)
-        insert.link_sentence_to_rawtokens(sentence=self)
+        batch = self.document.batch
+        if batch is not None:
+            batch.add_sentence_links(sentence=self, sentence_id=sentence_id)
+        else:
+            insert.link_sentence_to_rawtokens(sentence=self)
         insert.close_db()
         entities = Entities(sentence_id=sentence_id, sentence=self)
         entities.extract_and_insert()
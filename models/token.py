@@ -1,41 +1,57 @@
 import logging
-import re
 from typing import Any
 
-from pydantic import BaseModel
-
 import config
 from models.crud.insert import Insert
+from models.crud.lookup_tables import lookup_tables
 from models.crud.read import Read
+from models.token_filter import UNACCEPTED_POSTAGS, clean_token, is_accepted_text
 
 logger = logging.getLogger(__name__)
 
 
-class Token(BaseModel):
-    token: Any  # token from spaCy
-    sentence: Any
+class Token:
+    """An accepted token of a sentence, see Sentence.iterate_tokens
+
+    A plain class with __slots__ because we create tens of millions"""
+
+    __slots__ = ("token", "sentence")
+
+    def __init__(self, token: Any, sentence: Any):
+        self.token = token  # token from spaCy
+        self.sentence = sentence
 
     def analyze_and_insert(self):
         if self.is_accepted_token:
-            # logger.debug(spacy.explain(self.pos))
-            logger.debug(f"rawtoken: '{self.rawtoken}'")
-            logger.debug(f"normtoken: '{self.normalized_token}'")
-            read = Read()
-            read.connect_and_setup()
-            rawtoken_id = read.get_rawtoken_id(token=self)
-            insert = Insert()
-            insert.connect_and_setup()
-            if not rawtoken_id:
-                insert.insert_rawtoken(token=self)
-            normtoken_id = read.get_normtoken_id(token=self)
-            read.close_db()
-            if not normtoken_id:
-                insert.insert_normtoken(token=self)
-            insert.link_normtoken_to_rawtoken(token=self)
-            insert.close_db()
+            self.insert()
         else:
             logger.debug(f"discarded: text: '{self.rawtoken}', pos: {self.pos}")
 
+    def insert(self):
+        """Insert a token we already know is accepted"""
+        # logger.debug(spacy.explain(self.pos))
+        logger.debug(f"rawtoken: '{self.rawtoken}'")
+        logger.debug(f"normtoken: '{self.normalized_token}'")
+        sink = self.sentence.document.sink
+        batch = self.sentence.document.batch
+        if sink is not None:
+            sink.add_token(token=self)
+        elif batch is not None:
+            batch.add_token(token=self)
+        else:
+            self.insert_rawtoken_and_normtoken()
+
+    def insert_rawtoken_and_normtoken(self):
+        # Both ids are usually answered by the LRU caches
+        insert = Insert()
+        insert.connect_and_setup()
+        if not self.id:
+            insert.insert_rawtoken(token=self)
+        if not self.normtoken_id:
+            insert.insert_normtoken(token=self)
+        insert.link_normtoken_to_rawtoken(token=self)
+        insert.close_db()
+
     @property
     def id(self) -> int:
         """ID of this rawtoken in the database"""
@@ -57,6 +73,9 @@ class Token(BaseModel):
     @property
     def pos_id(self) -> int:
         """ID of the postag of this token in the database"""
+        pos_id = lookup_tables.lexical_categories.get(self.pos)
+        if pos_id is not None:
+            return pos_id
         read = Read()
         read.connect_and_setup()
         data = read.get_lexical_category_id(token=self)
@@ -80,39 +99,16 @@ class Token(BaseModel):
     def is_accepted_token(self) -> bool:
         """We accept a token which is has no
         numeric characters and is not a symbol and
-        not punctuation and has a detected language we accept"""
-        unaccepted_postags = ["SPACE", "PUNCT", "SYM", "X"]
-        unaccepted_chars = ["¶", "¤", "¥", "~", "$", "€", "|"]
-        if self.cleaned_token:
-            has_numeric = any(char.isnumeric() for char in self.rawtoken)
-            has_unacceptable_char = any(
-                char in unaccepted_chars for char in self.rawtoken
-            )
-            if (
-                self.token.pos_ not in unaccepted_postags
-                and not has_numeric
-                and not has_unacceptable_char
-                and self.sentence.detected_language in config.accepted_languages
-            ):
-                return True
-        return False
+        not punctuation and has a detected language we accept
+
+        Sentence.iterate_tokens uses TokenFilter to test all
+        tokens of a sentence at once with the same rules"""
+        return (
+            self.token.pos_ not in UNACCEPTED_POSTAGS
+            and self.sentence.detected_language in config.accepted_languages
+            and is_accepted_text(self.rawtoken)
+        )
 
     @property
     def cleaned_token(self) -> str:
-        # Remove newlines, digits and a selection of characters
-        return re.sub(
-            r"\d+",
-            "",
-            (
-                self.rawtoken.replace("\r", "")
-                .replace(":", "")
-                .replace(",", "")
-                .replace(".", "")
-                .replace("(", "")
-                .replace(")", "")
-                .replace("-", "")
-                .replace("–", "")
-                .replace("/", "")
-                .strip()
-            ),
-        )
+        return clean_token(self.rawtoken)
@@ -0,0 +1,71 @@
+import logging
+import re
+from typing import Any, Dict
+
+import numpy as np
+from pydantic import BaseModel
+from spacy.attrs import ORTH, POS
+from spacy.symbols import PUNCT, SPACE, SYM, X
+
+import config
+
+logger = logging.getLogger(__name__)
+
+UNACCEPTED_POSTAGS = ("SPACE", "PUNCT", "SYM", "X")
+UNACCEPTED_POS_IDS = np.array([SPACE, PUNCT, SYM, X], dtype=np.uint64)
+UNACCEPTED_CHARS = frozenset("¶¤¥~$€|")
+TOKEN_TRANSLATION = str.maketrans({char: None for char in "\r:,.()-–/"})
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def clean_token(text: str) -> str:
+    """Remove newlines, digits and a selection of characters"""
+    return DIGITS_PATTERN.sub("", text.translate(TOKEN_TRANSLATION).strip())
+
+
+def is_accepted_text(text: str) -> bool:
+    """The part of the acceptance test that only depends on the token text"""
+    return (
+        bool(clean_token(text))
+        and not any(char.isnumeric() for char in text)
+        and not any(char in UNACCEPTED_CHARS for char in text)
+    )
+
+
+class TokenFilter(BaseModel):
+    """Decides which tokens of a sentence we accept in one go
+
+    The part of speech is compared for the whole span with a numpy mask
+    and the text tests are run once per lexeme and then remembered,
+    so punctuation and numbers are discarded without building a Token."""
+
+    max_entries: int = config.token_filter_cache_size
+    accepted_orths: Dict[int, bool] = dict()
+
+    def accepted_indices(self, span: Any, language: str) -> np.ndarray:
+        """Indices of the accepted tokens relative to the start of the span"""
+        if language not in config.accepted_languages or not len(span):
+            return np.empty(0, dtype=np.intp)
+        array = span.to_array([POS, ORTH])
+        mask = ~np.isin(array[:, 0], UNACCEPTED_POS_IDS)
+        orths = array[:, 1]
+        unique_orths, inverse = np.unique(orths, return_inverse=True)
+        text_accepted = np.fromiter(
+            (self.is_accepted_orth(orth=int(orth), span=span) for orth in unique_orths),
+            dtype=bool,
+            count=len(unique_orths),
+        )
+        mask &= text_accepted[inverse.reshape(-1)]
+        return np.flatnonzero(mask)
+
+    def is_accepted_orth(self, orth: int, span: Any) -> bool:
+        accepted = self.accepted_orths.get(orth)
+        if accepted is None:
+            accepted = is_accepted_text(span.vocab.strings[orth])
+            if len(self.accepted_orths) >= self.max_entries:
+                self.accepted_orths.clear()
+            self.accepted_orths[orth] = accepted
+        return accepted
+
+
+token_filter = TokenFilter()
@@ -0,0 +1,41 @@
+"""Tab separated values in the format LOAD DATA reads by default"""
+import re
+from typing import Any, Iterator, List, Optional
+
+# The escapes LOAD DATA understands with its default FIELDS ESCAPED BY '\\'
+# and \N which it reads as NULL
+NULL = "\\N"
+ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"}
+)
+UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r", "0": "\0"}
+ESCAPE_PATTERN = re.compile(r"\\(.)")
+
+
+def escape(value: Any) -> str:
+    if value is None:
+        return NULL
+    return str(value).translate(ESCAPES)
+
+
+def unescape(value: str) -> str:
+    return ESCAPE_PATTERN.sub(
+        lambda match: UNESCAPES.get(match.group(1), match.group(1)), value
+    )
+
+
+def format_row(values: List[Any]) -> str:
+    return "\t".join(escape(value) for value in values) + "\n"
+
+
+def parse_row(line: str) -> List[Optional[str]]:
+    return [
+        None if value == NULL else unescape(value)
+        for value in line.rstrip("\n").split("\t")
+    ]
+
+
+def read_rows(path: str) -> Iterator[List[Optional[str]]]:
+    with open(path, "r", encoding="utf-8", newline="\n") as file:
+        for line in file:
+            yield parse_row(line)
@@ -0,0 +1,67 @@
+import logging
+from typing import Dict, Tuple
+
+from pydantic import BaseModel
+
+from models.tsv import format_row, read_rows
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, ...]
+
+
+class Vocabulary(BaseModel):
+    """Assigns ids to keys like (text, lexical_category, language)
+    in-process, so links can be written without asking the database
+
+    The ids are dense and start at 1. Extra columns that belong to a
+    key, like the score of a rawtoken, are kept from the first time
+    the key was seen. Vocabularies from several workers are combined
+    with merge which returns how to translate the ids of the other."""
+
+    ids: Dict[Key, int] = dict()
+    attributes: Dict[int, Tuple[str, ...]] = dict()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def id_of(self, key: Key, attributes: Tuple[str, ...] = ()) -> Tuple[int, bool]:
+        """Return the id of the key and whether it was new"""
+        id_ = self.ids.get(key)
+        if id_ is not None:
+            return id_, False
+        id_ = len(self.ids) + 1
+        self.ids[key] = id_
+        if attributes:
+            self.attributes[id_] = attributes
+        return id_, True
+
+    def row(self, id_: int, key: Key) -> str:
+        return format_row([id_, *key, *self.attributes.get(id_, ())])
+
+    def merge(self, other: "Vocabulary") -> Dict[int, int]:
+        """Add the keys of other and return a map from its ids to ours"""
+        remap: Dict[int, int] = dict()
+        for key, id_ in other.ids.items():
+            remap[id_], _ = self.id_of(
+                key=key, attributes=other.attributes.get(id_, ())
+            )
+        return remap
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8", newline="\n") as file:
+            for key, id_ in self.ids.items():
+                file.write(self.row(id_=id_, key=key))
+
+    @classmethod
+    def load(cls, path: str, key_length: int) -> "Vocabulary":
+        """Read a file of id, key columns and attribute columns"""
+        vocabulary = cls()
+        for row in read_rows(path=path):
+            id_ = int(row[0])
+            vocabulary.ids[tuple(row[1 : 1 + key_length])] = id_
+            if len(row) > 1 + key_length:
+                vocabulary.attributes[id_] = tuple(row[1 + key_length :])
+        if sorted(vocabulary.ids.values()) != list(range(1, len(vocabulary) + 1)):
+            raise ValueError(f"The ids in {path} are not dense")
+        return vocabulary
@@ -0,0 +1,95 @@
+import random
+from unittest import TestCase
+
+from models.chunking import (
+    BOUNDARIES,
+    find_chunk_end,
+    iterate_chunk_ends,
+    iterate_chunks,
+)
+from models.document import Document
+
+SEPARATORS = [separator for separators in BOUNDARIES for separator in separators]
+PIECES = ["Riksdagen", "beslutar", "ö", "x" * 30, ".", "?", " ", "\n", "\n\n", ". "]
+
+
+def random_text(generator: random.Random) -> str:
+    return "".join(generator.choice(PIECES) for _ in range(generator.randint(0, 200)))
+
+
+def chunks_of(text: str, chunk_size: int):
+    chunk_ends = list(iterate_chunk_ends(text=text, chunk_size=chunk_size))
+    return list(iterate_chunks(text=text, chunk_ends=chunk_ends))
+
+
+class TestChunking(TestCase):
+    def test_properties_of_random_texts(self):
+        generator = random.Random(25)
+        for _ in range(500):
+            text = random_text(generator)
+            chunk_size = generator.randint(1, 120)
+            chunks = chunks_of(text=text, chunk_size=chunk_size)
+            with self.subTest(text=text, chunk_size=chunk_size):
+                # No characters are lost or repeated
+                assert "".join(chunks) == text
+                assert all(0 < len(chunk) <= chunk_size for chunk in chunks)
+                start = 0
+                for chunk in chunks[:-1]:
+                    if not any(chunk.endswith(s) for s in SEPARATORS):
+                        # We only cut mid-word when the window had no boundary
+                        window = text[start : start + chunk_size]
+                        assert not any(s in window for s in SEPARATORS)
+                    start += len(chunk)
+
+    def test_prefers_paragraphs_then_sentences(self):
+        text = "Första stycket.\n\nAndra meningen. Tredje meningen är längre"
+        assert find_chunk_end(text=text, start=0, chunk_size=30) == 17
+        assert find_chunk_end(text=text, start=17, chunk_size=20) == 33
+        # A paragraph in the first half would give a small chunk
+        assert find_chunk_end(text=text, start=0, chunk_size=40) == 33
+
+    def test_short_and_empty_text(self):
+        assert chunks_of(text="Kort text.", chunk_size=100) == ["Kort text."]
+        assert chunks_of(text="", chunk_size=100) == []
+        with self.assertRaises(ValueError):
+            list(iterate_chunk_ends(text="text", chunk_size=0))
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            list(iterate_chunk_ends(text="text", chunk_size=2, start=5))
+        assert list(iterate_chunks(text="text", chunk_ends=[2, 4], first=2)) == []
+        with self.assertRaises(ValueError):
+            list(iterate_chunks(text="text", chunk_ends=[2, 4], first=3))
+
+    def test_long_text_without_boundaries(self):
+        text = "x" * 1_000_000
+        chunks = chunks_of(text=text, chunk_size=100000)
+        assert [len(chunk) for chunk in chunks] == [100000] * 10
+
+
+class TestDocumentChunks(TestCase):
+    def test_cleaned_chunks_resume_after_checkpoint(self):
+        text = "Riksdagen beslutar. " * 100
+        document = Document(external_id="", dataset_id=0, text=text, chunk_size=300)
+        document.chunk_text()
+        chunks = list(document.cleaned_chunks())
+        assert document.number_of_chunks == len(chunks) == 7
+        assert "".join(chunks) == text
+        document.processed_chunks = 5
+        assert list(document.cleaned_chunks()) == chunks[5:]
+
+    def test_resume_at_any_offset(self):
+        text = ("Ja. " + "ord " * 100) * 10
+        for offset in (3, 300, 2000, len(text) - 1, len(text)):
+            with self.subTest(offset=offset):
+                document = Document(
+                    external_id="",
+                    dataset_id=0,
+                    text=text,
+                    chunk_size=300,
+                    processed_offset=offset,
+                )
+                document.chunk_text()
+                assert document.processed_chunks == 1
+                # Nothing after the checkpoint is skipped
+                assert "".join(document.cleaned_chunks()) == text[offset:]
@@ -0,0 +1,39 @@
+import string
+from unittest import TestCase
+
+from models.cleaning import clean_sentence
+
+
+def reference_clean_sentence(sentence: str) -> str:
+    """The chained implementation clean_sentence replaced"""
+    sentence = (
+        sentence.replace("\t", " ")
+        .replace(":", "")
+        .replace("(", "")
+        .replace(")", "")
+        .replace("-", "")
+        .replace("–", "")
+        .replace("/", "")
+    )
+    sentence = "".join(char for char in sentence if char not in string.punctuation)
+    words = [
+        word for word in sentence.split() if not any(char.isdigit() for char in word)
+    ]
+    return " ".join(words)
+
+
+class TestCleaning(TestCase):
+    sentences = [
+        "Regeringen föreslår att riksdagen antar regeringens förslag till lag.",
+        "Enligt 3 kap. 2 § ska kommunen (se bet. 2019/20:FiU1) besluta.",
+        "Tabell\t2:\tKostnader 2020–2022 i mnkr",
+        "Ökningen var 5² procent och ① punkt – se bilaga\n\n4.",
+        "“Citat” med ‘andra’ tecken, ¶ och € finns kvar",
+        "",
+        "   \t  ",
+    ]
+
+    def test_matches_reference_implementation(self):
+        for sentence in self.sentences:
+            with self.subTest(sentence=sentence):
+                assert clean_sentence(sentence) == reference_clean_sentence(sentence)
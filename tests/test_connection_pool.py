@@ -0,0 +1,54 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import pymysql
+
+from models.crud.database_handler import ConnectionPool
+
+
+def fake_connection():
+    connection = MagicMock()
+    connection.open = True
+    connection.server_status = 0
+    return connection
+
+
+class TestConnectionPool(TestCase):
+    def test_reuses_released_connection(self):
+        pool = ConnectionPool(size=2)
+        with patch.object(ConnectionPool, "connect", side_effect=fake_connection):
+            connection, cursor = pool.acquire()
+            pool.release(connection=connection, cursor=cursor)
+            again, again_cursor = pool.acquire()
+        assert again is connection
+        assert again_cursor is cursor
+        assert pool.created_count == 1
+        assert pool.reused_count == 1
+
+    def test_closes_connections_beyond_size(self):
+        pool = ConnectionPool(size=1)
+        with patch.object(ConnectionPool, "connect", side_effect=fake_connection):
+            first = pool.acquire()
+            second = pool.acquire()
+        pool.release(*first)
+        pool.release(*second)
+        assert len(pool.idle) == 1
+        second[0].close.assert_called_once()
+
+    def test_rolls_back_open_transaction_on_release(self):
+        pool = ConnectionPool()
+        with patch.object(ConnectionPool, "connect", side_effect=fake_connection):
+            connection, cursor = pool.acquire()
+        connection.server_status = 1  # SERVER_STATUS_IN_TRANS
+        pool.release(connection=connection, cursor=cursor)
+        connection.rollback.assert_called_once()
+
+    def test_discards_connection_failing_health_check(self):
+        pool = ConnectionPool(health_check_seconds=0)
+        with patch.object(ConnectionPool, "connect", side_effect=fake_connection):
+            broken, cursor = pool.acquire()
+            pool.release(connection=broken, cursor=cursor)
+            broken.ping.side_effect = pymysql.Error("gone")
+            fresh, _ = pool.acquire()
+        assert fresh is not broken
+        assert pool.created_count == 2
@@ -0,0 +1,80 @@
+import codecs
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from models.dataset import Dataset
+from models.document_source import DocumentSource
+
+
+class TestDocumentSource(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.write(
+            "b/h901.json",
+            {
+                "dokumentstatus": {
+                    "dokument": {"dok_id": "H901", "html": "<p>Hej</p>"},
+                    "dokbilaga": {"bilaga": [{"fil_url": "x"}]},
+                }
+            },
+            bom=True,
+        )
+        self.write("a/h900.json", {"dokumentstatus": {"dokuppgift": {}}})
+        self.write("a/notes.txt", {})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name: str, data: dict, bom: bool = False):
+        path = os.path.join(self.directory.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            if bom:
+                file.write(codecs.BOM_UTF8)
+            file.write(json.dumps(data).encode("utf-8"))
+
+    def test_iterates_json_files(self):
+        source = DocumentSource(workdirectory=self.directory.name)
+        names = [os.path.basename(path) for path in source.iterate_file_paths()]
+        # In the order of the file system
+        assert sorted(names) == ["h900.json", "h901.json"]
+
+    def test_reads_only_wanted_fields(self):
+        source = DocumentSource(workdirectory=self.directory.name)
+        path = os.path.join(self.directory.name, "b/h901.json")
+        assert source.read_fields(file_path=path) == {
+            "dok_id": "H901",
+            "html": "<p>Hej</p>",
+        }
+
+    def test_missing_dokument_gives_none(self):
+        source = DocumentSource(workdirectory=self.directory.name)
+        path = os.path.join(self.directory.name, "a/h900.json")
+        assert source.read_fields(file_path=path) is None
+
+    def test_stops_at_dok_id_to_skip(self):
+        source = DocumentSource(
+            workdirectory=self.directory.name, skip_external_ids={"H901"}
+        )
+        path = os.path.join(self.directory.name, "b/h901.json")
+        assert source.read_fields(file_path=path) == {"dok_id": "H901"}
+
+
+class TestDatasetFilePaths(TestCase):
+    def test_document_limit_counts_our_shard(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for number in range(40):
+                with open(os.path.join(directory, f"h9{number:02}.json"), "w") as file:
+                    file.write("{}")
+            for shard in range(2):
+                dataset = Dataset(
+                    id=1, workers=2, shard=shard, max_documents_to_extract_per_dataset=5
+                )
+                file_paths = list(dataset.iterate_file_paths(workdirectory=directory))
+                assert len(file_paths) == 5
+                assert all(
+                    Dataset.shard_of(file_path=path, workers=2) == shard
+                    for path in file_paths
+                )
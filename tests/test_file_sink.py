@@ -0,0 +1,82 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+
+import spacy
+
+from models.file_sink import COMPLETE_MARKER, FILES, FileSink
+from models.sentence import Sentence
+from models.tsv import format_row, read_rows
+
+
+class TestFileSink(TestCase):
+    text = "Regeringen föreslår\tatt riksdagen antar förslaget om Sverige."
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sink = FileSink(directory=os.path.join(self.directory.name, "shard"))
+        nlp = spacy.blank("sv")
+        nlp.add_pipe("sentencizer")
+        self.doc = nlp(self.text)
+        for token in self.doc:
+            token.pos_ = "PUNCT" if token.is_punct else "NOUN"
+        start = self.text.index("Sverige")
+        self.doc.ents = [self.doc.char_span(start, start + len("Sverige"), label="LOC")]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, name: str):
+        with open(os.path.join(self.sink.directory, f"{name}.tsv")) as file:
+            return [line.rstrip("\n").split("\t") for line in file]
+
+    def test_writes_sentence_tokens_and_entities(self):
+        self.sink.open()
+        document = SimpleNamespace(external_id="H901FiU1", sink=self.sink, batch=None)
+        sentence = Sentence(
+            sent=list(self.doc.sents)[0], doc=self.doc, document=document
+        )
+        sentence.detected_language = "sv"
+        sentence.score = 0.97
+        sentence.analyze_and_insert()
+        self.sink.add_document(document=document)
+        assert not os.path.exists(os.path.join(self.sink.directory, COMPLETE_MARKER))
+        self.sink.close()
+
+        assert self.sink.is_complete
+        assert sorted(os.listdir(self.sink.directory)) == sorted(
+            [f"{name}.tsv" for name in FILES] + [COMPLETE_MARKER]
+        )
+        assert self.read("documents") == [["H901FiU1"]]
+        [row] = self.read("sentences")
+        # The tab inside the sentence is escaped for LOAD DATA
+        assert row[2] == self.text.replace("\t", "\\t")
+        assert row[3] == sentence.text_hash.hex()
+        assert row[4:] == ["sv", "0.97"]
+        assert len(self.read("rawtokens")) == 8
+        assert [row[1] for row in self.read("normtokens")][-1] == "sverige"
+        # Links refer to tokens by the ids of the shard vocabulary
+        rawtoken_ids = [row[0] for row in self.read("rawtokens")]
+        assert rawtoken_ids == [str(id_) for id_ in range(1, 9)]
+        assert sorted(row[1] for row in self.read("sentence_rawtoken")) == sorted(
+            rawtoken_ids
+        )
+        assert self.read("entities") == [["Sverige", "LOC"]]
+        assert self.read("sentence_entity") == [[sentence.uuid, "Sverige", "LOC"]]
+
+
+class TestTsv(TestCase):
+    def test_round_trip(self):
+        row = ["tab\there", "line\nbreak\r", "back\\slash", "\\N", None, 0.97, "\0"]
+        line = format_row(row)
+        # One line per row and one tab per column, \N is NULL to LOAD DATA
+        assert line.count("\n") == 1 and line.count("\t") == len(row) - 1
+        assert line.split("\t")[3:5] == ["\\\\N", "\\N"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rows.tsv")
+            with open(path, "w", encoding="utf-8", newline="\n") as file:
+                file.write(line)
+            assert list(read_rows(path=path)) == [
+                ["tab\there", "line\nbreak\r", "back\\slash", "\\N", None, "0.97", "\0"]
+            ]
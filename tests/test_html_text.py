@@ -0,0 +1,57 @@
+import re
+from unittest import TestCase
+
+from models.html_text import beautifulsoup_html_to_text, iterate_html_text
+
+HTML = (
+    "<html><head><style>p { color: red }</style></head><body>"
+    "<div><h1>Rubrik</h1>"
+    "<p>Regeringen <b>föreslår</b> att <i>riksdagen</i> antar förslaget.</p>"
+    "<!-- kommentar -->"
+    "<table><tr><td>Anslag</td><td>1 234</td></tr></table>"
+    "<p>Lagen träder i kraft den 1 januari &amp; gäller <br/>tills vidare.</p>"
+    "Text efter stycket</div><script>var x = 1;</script></body></html>"
+)
+
+
+def words(text: str):
+    return re.findall(r"\w+", text)
+
+
+class TestHtmlText(TestCase):
+    def test_text_in_document_order_without_tables(self):
+        assert list(iterate_html_text(html=HTML)) == [
+            "Rubrik",
+            "Regeringen ",
+            "föreslår",
+            " att ",
+            "riksdagen",
+            " antar förslaget.",
+            "Lagen träder i kraft den 1 januari & gäller ",
+            "tills vidare.",
+            "Text efter stycket",
+        ]
+
+    def test_same_words_as_beautifulsoup_except_tables(self):
+        without_table = re.sub(r"<table>.*</table>", "", HTML)
+        assert words(" ".join(iterate_html_text(html=HTML))) == words(
+            beautifulsoup_html_to_text(html=without_table)
+        )
+
+    def test_independent_of_feed_size(self):
+        expected = list(iterate_html_text(html=HTML))
+        for feed_size in (1, 2, 7, 64):
+            with self.subTest(feed_size=feed_size):
+                assert list(iterate_html_text(html=HTML, feed_size=feed_size)) == (
+                    expected
+                )
+
+    def test_large_document(self):
+        html = "<div>" + "<p>Riksdagen <b>beslutar</b> idag.</p>" * 20000 + "</div>"
+        text = " ".join(iterate_html_text(html=html, feed_size=4096))
+        assert len(words(text)) == 60000
+
+    def test_empty_and_plain_text(self):
+        assert list(iterate_html_text(html="")) == []
+        assert list(iterate_html_text(html="<!-- bara en kommentar -->")) == []
+        assert list(iterate_html_text(html="bara text")) == ["bara text"]
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from time import sleep
+from unittest import TestCase
+
+from models.instrumentation import Instrumentation, Metrics
+
+
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        self.instrumentation = Instrumentation(enabled=True, max_documents=2)
+
+    def test_nested_timers_are_not_counted_twice(self):
+        with self.instrumentation.timer(name="outer"):
+            with self.instrumentation.timer(name="inner"):
+                sleep(0.02)
+        outer = self.instrumentation.total.timers["outer"]
+        inner = self.instrumentation.total.timers["inner"]
+        assert outer[0] == inner[0] == 1
+        assert outer[1] >= inner[1] >= 0.02
+        assert outer[2] < 0.01
+        assert abs(self.instrumentation.total.seconds - outer[1]) < 1e-9
+
+    def test_scopes(self):
+        self.instrumentation.start_dataset(dataset_id=3)
+        document = Metrics()
+        with self.instrumentation.document_scope(metrics=document):
+            self.instrumentation.count(name="sentences", number=5)
+        self.instrumentation.count(name="sentences", number=2)
+        assert document.counters == {"sentences": 5}
+        assert self.instrumentation.datasets[3].counters == {"sentences": 7}
+        assert self.instrumentation.total.counters == {"sentences": 7}
+
+    def test_keeps_the_slowest_documents(self):
+        for external_id, seconds in (("a", 1.0), ("b", 3.0), ("c", 2.0)):
+            metrics = Metrics()
+            metrics.add_time(name="nlp", seconds=seconds, self_seconds=seconds)
+            self.instrumentation.finish_document(
+                external_id=external_id, metrics=metrics
+            )
+        slowest = self.instrumentation.to_dict()["slowest_documents"]
+        assert [document["external_id"] for document in slowest] == ["b", "c"]
+
+    def test_merge_a_worker_snapshot(self):
+        worker = Instrumentation(enabled=True)
+        worker.start_dataset(dataset_id=1)
+        with worker.timer(name="nlp"):
+            pass
+        worker.count(name="documents")
+        self.instrumentation.merge(dataset_id=1, snapshot=worker.snapshot(1))
+        self.instrumentation.merge(dataset_id=1, snapshot=worker.snapshot(1))
+        assert self.instrumentation.datasets[1].timers["nlp"][0] == 2
+        assert self.instrumentation.total.counters == {"documents": 2}
+
+    def test_iterate_times_every_step(self):
+        assert list(self.instrumentation.iterate(name="step", iterable="abc")) == [
+            "a",
+            "b",
+            "c",
+        ]
+        # The last call is the one that raises StopIteration
+        assert self.instrumentation.total.timers["step"][0] == 4
+
+    def test_dump(self):
+        self.instrumentation.start_dataset(dataset_id=1)
+        with self.instrumentation.timer(name="nlp"):
+            self.instrumentation.count(name="documents")
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "metrics.json")
+            self.instrumentation.dump(path=json_path)
+            with open(json_path) as file:
+                data = json.load(file)
+            assert data["datasets"]["1"]["timers"]["nlp"]["calls"] == 1
+            prometheus_path = os.path.join(directory, "metrics.prom")
+            self.instrumentation.dump(path=prometheus_path)
+            with open(prometheus_path) as file:
+                text = file.read()
+        assert "# TYPE riksdagen_stage_seconds_total counter" in text
+        assert 'riksdagen_stage_calls_total{dataset="all",stage="nlp"} 1' in text
+        assert 'riksdagen_events_total{dataset="1",name="documents"} 1' in text
+
+    def test_disabled(self):
+        instrumentation = Instrumentation(enabled=False)
+        with instrumentation.timer(name="nlp"):
+            instrumentation.count(name="documents")
+        assert instrumentation.total.timers == {}
+        assert instrumentation.total.counters == {}
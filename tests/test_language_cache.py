@@ -0,0 +1,53 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+
+from models.language_cache import LanguageCache
+from models.language_detector import LanguageDetector
+
+
+class TestLanguageCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "language_cache.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_persists_between_runs(self):
+        key = LanguageCache.key("Regeringen föreslår att riksdagen antar förslaget")
+        cache = LanguageCache(path=self.path)
+        assert cache.get_many(keys=[key]) == {}
+        cache.put_many(results={key: ("sv", 0.98)})
+        cache.close()
+        cache = LanguageCache(path=self.path)
+        assert cache.get_many(keys=[key]) == {key: ("sv", 0.98)}
+        assert cache.hits == 1
+        assert cache.misses == 0
+        cache.close()
+
+    def test_keeps_newest_entries(self):
+        cache = LanguageCache(path=self.path, max_entries=2)
+        keys = [LanguageCache.key(f"mening {number}") for number in range(3)]
+        for key in keys:
+            cache.put_many(results={key: ("sv", 0.9)})
+        cache.close()
+        cache = LanguageCache(path=self.path, max_entries=2)
+        assert sorted(cache.get_many(keys=keys)) == sorted(keys[1:])
+        cache.close()
+
+    def test_detector_uses_cache(self):
+        cache = LanguageCache(path=self.path)
+        text = "Regeringen föreslår att riksdagen antar förslaget"
+        cache.put_many(results={LanguageCache.key(text): ("sv", 0.987)})
+        sentences = [
+            SimpleNamespace(cleaned_sentence=text, score=0.0, detected_language="")
+            for _ in range(2)
+        ]
+        detector = LanguageDetector(cache=cache)
+        detector.detect_sentences(sentences=sentences)
+        cache.close()
+        # Every sentence was answered by the cache so fasttext was never loaded
+        assert detector.model is None
+        assert [(s.detected_language, s.score) for s in sentences] == [("sv", 0.99)] * 2
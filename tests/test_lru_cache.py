@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from models.crud.lru_cache import LruCache
+
+
+class TestLruCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LruCache(name="test", max_entries=2)
+        cache.put("regeringen", 1)
+        cache.put("riksdagen", 2)
+        # Touch the oldest entry so the other one is evicted
+        assert cache.get("regeringen") == 1
+        cache.put("utskottet", 3)
+        assert cache.get("riksdagen") is None
+        assert cache.get("regeringen") == 1
+        assert cache.get("utskottet") == 3
+        assert len(cache) == 2
+
+    def test_counts_hits_and_misses(self):
+        cache = LruCache(name="test", max_entries=10)
+        cache.get(("regeringen", 1))
+        cache.put(("regeringen", 1), 42)
+        cache.get(("regeringen", 1))
+        cache.get(("regeringen", 1))
+        assert cache.hits == 2
+        assert cache.misses == 1
+        assert round(cache.hit_rate, 2) == 0.67
+
+    def test_does_not_cache_missing_ids(self):
+        cache = LruCache(name="test", max_entries=10)
+        cache.put("regeringen", None)
+        assert len(cache) == 0
@@ -0,0 +1,48 @@
+import os
+import pstats
+import tempfile
+from time import perf_counter
+from unittest import TestCase
+
+from models.profiler import Profiler
+
+
+def busy(seconds: float) -> int:
+    total = 0
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        total += 1
+    return total
+
+
+class TestProfiler(TestCase):
+    def test_profiles_the_first_documents(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = Profiler(
+                path=os.path.join(directory, "out.prof"),
+                max_documents=2,
+                sample_interval=0.001,
+            )
+            profiler.start()
+            for _ in range(3):
+                busy(seconds=0.05)
+                profiler.document_finished()
+            assert not profiler.running
+            assert profiler.documents == 2
+            stats = pstats.Stats(profiler.path)
+            assert any(function == "busy" for _, _, function in stats.stats)
+            with open(os.path.join(directory, "out.collapsed")) as file:
+                lines = file.read().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert "busy (" in stack
+        assert stack.index("test_profiles_the_first_documents") < stack.index("busy")
+
+    def test_disabled_without_path(self):
+        profiler = Profiler()
+        profiler.start()
+        profiler.document_finished()
+        profiler.stop()
+        assert not profiler.running
+        assert profiler.documents == 0
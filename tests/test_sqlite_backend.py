@@ -0,0 +1,299 @@
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import spacy
+
+from models.crud.batch_insert import BatchInsert
+from models.crud.create import Create
+from models.crud.database_handler import Backend, use_backend
+from models.crud.lookup_tables import lookup_tables
+from models.crud.lru_cache import normtoken_ids, rawtoken_ids
+from models.crud.offline_loader import OfflineLoader
+from models.crud.read import Read
+from models.crud.sqlite import SqliteBackend, translate
+from models.datasets import Datasets
+from models.document import Document
+from models.exceptions import MissingInformationError
+from models.file_sink import LOADED_MARKER, FileSink
+from models.sentence import Sentence, hash_text
+
+
+class TestTranslate(TestCase):
+    def test_translates_mariadb_idioms(self):
+        assert translate(
+            "INSERT INTO score (value) VALUES (%s) "
+            "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id);"
+        ) == (
+            "INSERT INTO score (value) VALUES (?) "
+            "ON CONFLICT DO UPDATE SET id = id RETURNING id",
+            True,
+        )
+        assert translate("SELECT id FROM t ORDER BY id LOCK IN SHARE MODE") == (
+            "SELECT id FROM t ORDER BY id",
+            False,
+        )
+        assert translate("DROP TEMPORARY TABLE IF EXISTS staging_documents") == (
+            "DROP TABLE IF EXISTS staging_documents",
+            False,
+        )
+        assert translate("INSERT IGNORE INTO t (a) VALUES (%(a)s)") == (
+            "INSERT OR IGNORE INTO t (a) VALUES (:a)",
+            False,
+        )
+        assert translate(
+            "id SMALLINT UNSIGNED PRIMARY KEY AUTO_INCREMENT, "
+            "document SMALLINT UNSIGNED NOT NULL, "
+            "UNIQUE KEY uq_sentence_text_hash (text_hash, document)"
+        )[0] == (
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "document SMALLINT NOT NULL, "
+            "CONSTRAINT uq_sentence_text_hash UNIQUE (text_hash, document)"
+        )
+
+
+class TestBackend(TestCase):
+    def test_backend_must_implement_every_method(self):
+        class IncompleteBackend(Backend):
+            def acquire(self):
+                return None, None
+
+        with self.assertRaises(TypeError):
+            IncompleteBackend()
+
+
+class TestSqliteBackend(TestCase):
+    """Runs the CRUD classes against the real schema in a SQLite file"""
+
+    text = "Regeringen föreslår att riksdagen antar förslaget om Sverige och Norge."
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.sqlite")
+        self.previous_backend = use_backend(SqliteBackend(path=self.path))
+        for cache in (rawtoken_ids, normtoken_ids):
+            cache.clear()
+        create = Create()
+        create.connect_and_setup()
+        create.close_db()
+        datasets = Datasets(max_documents_to_extract=0, max_datasets_to_extract=0)
+        datasets.load_languages_from_yaml()
+        datasets.insert_datasets()
+        self.document = Document(external_id="H901FiU1", dataset_id=1)
+        self.document.insert_if_missing()
+        nlp = spacy.blank("sv")
+        nlp.add_pipe("sentencizer")
+        self.doc = nlp(self.text)
+        for token in self.doc:
+            token.pos_ = "PUNCT" if token.is_punct else "NOUN"
+        start = self.text.index("Sverige")
+        self.doc.ents = [self.doc.char_span(start, start + 7, label="LOC")]
+
+    def tearDown(self):
+        use_backend(self.previous_backend).close_all()
+        # The lookup tables now hold ids from the temporary database
+        lookup_tables.clear()
+        for cache in (rawtoken_ids, normtoken_ids):
+            cache.clear()
+        self.directory.cleanup()
+
+    def analyze(self) -> Sentence:
+        sentence = Sentence(
+            sent=list(self.doc.sents)[0], doc=self.doc, document=self.document
+        )
+        sentence.detected_language = "sv"
+        sentence.score = 0.97
+        sentence.analyze_and_insert()
+        return sentence
+
+    def count_rows(self):
+        read = Read()
+        read.connect_and_setup()
+        counts = dict()
+        for table in (
+            "document",
+            "sentence",
+            "rawtoken",
+            "normtoken",
+            "rawtoken_normtoken_linking",
+            "rawtoken_sentence_linking",
+            "entity",
+            "sentence_entity_linking",
+        ):
+            read.cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = read.cursor.fetchone()[0]
+        read.close_db()
+        return counts
+
+    expected_counts = {
+        "document": 1,
+        "sentence": 1,
+        "rawtoken": 10,
+        "normtoken": 10,
+        "rawtoken_normtoken_linking": 10,
+        "rawtoken_sentence_linking": 10,
+        "entity": 1,
+        "sentence_entity_linking": 1,
+    }
+
+    def test_per_row_ingest(self):
+        sentence = self.analyze()
+        assert self.count_rows() == self.expected_counts
+        assert sentence.id
+        # The same sentence again is recognized by its hash
+        self.analyze()
+        assert self.count_rows() == self.expected_counts
+
+    def test_case_and_trailing_spaces_are_duplicates(self):
+        self.analyze()
+        # The old unique key compared the text case insensitively
+        # and without trailing spaces, see hash_text
+        nlp = spacy.blank("sv")
+        nlp.add_pipe("sentencizer")
+        self.doc = nlp(self.text.upper() + "  ")
+        for token in self.doc:
+            token.pos_ = "PUNCT" if token.is_punct else "NOUN"
+        assert list(self.doc.sents)[0].text != self.text
+        self.analyze()
+        assert self.count_rows()["sentence"] == 1
+        assert hash_text("JA.  ") == hash_text("ja.") != hash_text("Nej.")
+        assert hash_text("Överenskommelse om ÅÄÖ") == hash_text(
+            "ÖVERENSKOMMELSE OM åäö"
+        )
+        # Unlike the old collation we do not ignore accents
+        assert hash_text("idé") != hash_text("ide")
+
+    def test_resume_after_checkpoint(self):
+        text = ("Ja. " + "ord " * 100) * 10
+        document = Document(
+            external_id="H901FiU1", dataset_id=1, text=text, chunk_size=300
+        )
+        document.prepare_extraction()
+        chunks = list(document.cleaned_chunks())
+        document.checkpoint_chunk()
+        document.checkpoint_chunk()
+        document.finish_extraction()
+
+        resumed = Document(
+            external_id="H901FiU1", dataset_id=1, text=text, chunk_size=300
+        )
+        resumed.prepare_extraction()
+        assert resumed.processed_offset == len(chunks[0]) + len(chunks[1])
+        assert list(resumed.cleaned_chunks()) == chunks[2:]
+        resumed.finish_extraction()
+
+        # E.g. the text of the document changed on disk
+        shorter = Document(external_id="H901FiU1", dataset_id=1, text=text[:100])
+        shorter.prepare_extraction()
+        assert shorter.processed_offset == 0
+        assert list(shorter.cleaned_chunks()) == [text[:100]]
+        shorter.finish_extraction()
+
+    def test_batched_flush_sees_rows_of_another_worker(self):
+        self.document.batch = BatchInsert()
+        self.analyze()
+        key = min(self.document.batch.rawtokens)
+        row = self.document.batch.rawtokens[key]
+        get_rawtoken_ids = BatchInsert.get_rawtoken_ids
+        reads = list()
+
+        def insert_after_first_read(batch, keys, locking=False):
+            ids = get_rawtoken_ids(batch, keys=keys, locking=locking)
+            reads.append(locking)
+            if len(reads) == 1:
+                # Another worker commits the same rawtoken in the middle
+                # of our flush, after our snapshot was taken
+                other = sqlite3.connect(self.path, timeout=1)
+                other.execute(
+                    "INSERT INTO rawtoken (lexical_category, text, language, score) "
+                    "VALUES (?, ?, ?, ?)",
+                    row,
+                )
+                other.commit()
+                other.close()
+            return ids
+
+        with patch.object(
+            BatchInsert,
+            "get_rawtoken_ids",
+            autospec=True,
+            side_effect=insert_after_first_read,
+        ):
+            self.document.batch.close_db()
+        assert reads == [False, True]
+        assert self.count_rows() == self.expected_counts
+        assert rawtoken_ids.get(key) == 1
+
+    def test_batched_flush_fails_clearly_on_missing_ids(self):
+        self.document.batch = BatchInsert()
+        self.analyze()
+        with patch.object(BatchInsert, "get_rawtoken_ids", return_value=dict()):
+            with self.assertRaises(MissingInformationError):
+                self.document.batch.flush()
+
+    def test_batched_ingest(self):
+        self.document.batch = BatchInsert()
+        self.analyze()
+        # The connection is only borrowed while we flush
+        assert self.document.batch.connection is None
+        self.document.batch.close_db()
+        assert self.count_rows() == self.expected_counts
+
+    def test_offline_load(self):
+        # Two rawtokens share a normtoken, so the ids of the two
+        # vocabularies differ and a join on the wrong one is caught
+        self.text = "Riksdagen antar förslaget och riksdagen lägger det till Sverige."
+        nlp = spacy.blank("sv")
+        nlp.add_pipe("sentencizer")
+        self.doc = nlp(self.text)
+        for token in self.doc:
+            token.pos_ = "PUNCT" if token.is_punct else "NOUN"
+        start = self.text.index("Sverige")
+        self.doc.ents = [self.doc.char_span(start, start + 7, label="LOC")]
+        offline_directory = os.path.join(self.directory.name, "offline")
+        self.document.sink = FileSink(
+            directory=os.path.join(offline_directory, "dataset_1", "shard_0_of_1")
+        )
+        self.document.sink.open()
+        sentence = self.analyze()
+        self.document.sink.add_document(document=self.document)
+        self.document.sink.close()
+        assert self.count_rows()["sentence"] == 0
+
+        loader = OfflineLoader()
+        loader.connect_and_setup()
+        loader.load_all(directory=offline_directory)
+        loader.close_db()
+        expected_counts = dict(
+            self.expected_counts,
+            rawtoken=9,
+            normtoken=8,
+            rawtoken_normtoken_linking=9,
+            rawtoken_sentence_linking=9,
+        )
+        assert self.count_rows() == expected_counts
+        assert os.path.isfile(os.path.join(self.document.sink.directory, LOADED_MARKER))
+        read = Read()
+        read.connect_and_setup()
+        read.cursor.execute(
+            "SELECT sentence.text, sentence.text_hash, document.processed "
+            "FROM sentence JOIN document ON document.id = sentence.document"
+        )
+        assert read.cursor.fetchall() == [(self.text, sentence.text_hash, 1)]
+        # Every token is linked to its own normtoken and the sentence
+        read.cursor.execute(
+            "SELECT COUNT(*) FROM rawtoken "
+            "JOIN rawtoken_normtoken_linking AS x ON x.rawtoken = rawtoken.id "
+            "JOIN normtoken ON normtoken.id = x.normtoken "
+            "WHERE normtoken.text = LOWER(rawtoken.text)"
+        )
+        assert read.cursor.fetchone()[0] == 9
+        read.close_db()
+
+        # Loading again does nothing, the shard is marked as loaded
+        loader.connect_and_setup()
+        loader.load_all(directory=offline_directory)
+        loader.close_db()
+        assert self.count_rows() == expected_counts
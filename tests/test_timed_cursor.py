@@ -0,0 +1,54 @@
+import sqlite3
+from unittest import TestCase
+
+from models.crud.timed_cursor import TimedCursor, normalize
+from models.instrumentation import STATEMENT_PREFIX, instrumentation
+
+
+class TestNormalize(TestCase):
+    def test_literals_and_placeholders(self):
+        assert (
+            normalize(
+                """SELECT id
+                FROM rawtoken
+                WHERE text = %s AND language = 3 AND label = 'it''s';"""
+            )
+            == "SELECT id FROM rawtoken WHERE text = ? AND language = ? AND label = ?"
+        )
+
+    def test_repeated_rows(self):
+        assert normalize(
+            "INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)"
+        ) == normalize("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)")
+        derived = " UNION ALL ".join(["SELECT %s AS text"] * 3)
+        assert (
+            normalize(f"SELECT k.text FROM ({derived}) AS k")
+            == "SELECT k.text FROM (SELECT ? AS text UNION ALL ...) AS k"
+        )
+
+
+class TestTimedCursor(TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE t (a INTEGER)")
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_records_statements(self):
+        cursor = TimedCursor(cursor=self.connection.cursor(), slow_query_seconds=0)
+        name = STATEMENT_PREFIX + "INSERT INTO t (a) VALUES (?)"
+        before = instrumentation.total.timers.get(name, [0])[0]
+        for value in range(3):
+            cursor.execute("INSERT INTO t (a) VALUES (?)", (value,))
+        cursor.executemany("INSERT INTO t (a) VALUES (?)", [(3,), (4,)])
+        assert instrumentation.total.timers[name][0] - before == 4
+        cursor.execute("SELECT COUNT(*) FROM t")
+        assert cursor.fetchone() == (5,)
+        assert cursor.rowcount == -1
+
+    def test_logs_slow_queries(self):
+        cursor = TimedCursor(cursor=self.connection.cursor(), slow_query_seconds=1e-9)
+        with self.assertLogs("models.crud.timed_cursor", level="WARNING") as logs:
+            cursor.execute("SELECT a FROM t WHERE a = 5")
+        assert "SELECT a FROM t WHERE a = ?" in logs.output[0]
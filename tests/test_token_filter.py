@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+import spacy
+from spacy.tokens import Doc
+
+from models.token import Token
+from models.token_filter import TokenFilter
+
+
+class TestTokenFilter(TestCase):
+    words = [
+        "Enligt",
+        "3",
+        "kap.",
+        "¶",
+        "ska",
+        "(",
+        "se",
+        "2019/20:FiU1",
+        "\n",
+        "bet",
+        "–",
+        "€100",
+        "X-et",
+        ".",
+    ]
+    pos = [
+        "ADP",
+        "NUM",
+        "NOUN",
+        "SYM",
+        "AUX",
+        "PUNCT",
+        "VERB",
+        "NOUN",
+        "SPACE",
+        "NOUN",
+        "PUNCT",
+        "NOUN",
+        "X",
+        "PUNCT",
+    ]
+
+    def setUp(self):
+        nlp = spacy.blank("sv")
+        self.doc = Doc(nlp.vocab, words=self.words, pos=self.pos)
+
+    def accepted_indices(self, language: str):
+        span = self.doc[1:]
+        return TokenFilter().accepted_indices(span=span, language=language).tolist()
+
+    def test_matches_is_accepted_token(self):
+        span = self.doc[1:]
+        sentence = SimpleNamespace(detected_language="sv")
+        expected = [
+            index
+            for index, token_ in enumerate(span)
+            if Token(token=token_, sentence=sentence).is_accepted_token
+        ]
+        assert self.accepted_indices(language="sv") == expected
+        assert [span[index].text for index in expected] == ["kap.", "ska", "se", "bet"]
+
+    def test_unaccepted_language(self):
+        assert self.accepted_indices(language="tr") == []
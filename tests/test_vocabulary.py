@@ -0,0 +1,36 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from models.vocabulary import Vocabulary
+
+
+class TestVocabulary(TestCase):
+    def test_assigns_dense_stable_ids(self):
+        vocabulary = Vocabulary()
+        assert vocabulary.id_of(("riksdagen", "NOUN", "sv"), ("0.98",)) == (1, True)
+        assert vocabulary.id_of(("Regeringen", "NOUN", "sv"), ("0.9",)) == (2, True)
+        # The first attributes win
+        assert vocabulary.id_of(("riksdagen", "NOUN", "sv"), ("0.5",)) == (1, False)
+        assert vocabulary.attributes[1] == ("0.98",)
+
+    def test_merge_returns_remap(self):
+        first = Vocabulary()
+        first.id_of(("riksdagen",))
+        first.id_of(("regeringen",))
+        second = Vocabulary()
+        second.id_of(("utskottet",))
+        second.id_of(("riksdagen",))
+        assert first.merge(second) == {1: 3, 2: 1}
+        assert len(first) == 3
+
+    def test_save_and_load(self):
+        vocabulary = Vocabulary()
+        vocabulary.id_of(("tab\there", "X", "sv"), ("0.4",))
+        vocabulary.id_of(("back\\slash\n", "NOUN", "sv"), ("0.9",))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rawtokens.tsv")
+            vocabulary.save(path=path)
+            loaded = Vocabulary.load(path=path, key_length=3)
+        assert loaded.ids == vocabulary.ids
+        assert loaded.attributes == vocabulary.attributes